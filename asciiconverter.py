@@ -1,10 +1,54 @@
 import unidecode
-from flipdot.fonts import narrow as font
-
-def converter(text):
-    newtext = ""
-    for c in text:
-        if c not in font.keys():
-            c = unidecode.unidecode(c)
-        newtext += c
-    return newtext
+from flipdot.fonts import Font
+
+_tables = {}  # font name -> Transliterator
+_default = None  # font used if none is given
+
+
+class Transliterator(dict):
+    """
+    Translation table for str.translate: characters the font has glyphs for are kept, all others are
+    transliterated with unidecode on first use and remembered
+    """
+    def __init__(self, font: Font, cachesize: int = 1024):
+        super().__init__((ord(char), ord(char)) for char in font.chars() if len(char) == 1)
+        self.basesize = len(self)
+        self.cachesize = cachesize  # number of transliterations to remember
+
+    def __missing__(self, ordinal: int) -> str:
+        if len(self) >= self.basesize + self.cachesize:
+            # forget all transliterations, but keep the characters of the font
+            for key in list(self.keys())[self.basesize:]:
+                del self[key]
+        value = unidecode.unidecode(chr(ordinal))
+        self[ordinal] = value
+        return value
+
+
+def table(font: Font = None) -> Transliterator:
+    """
+    Returns the translation table for <font>, built on first use
+    """
+    global _default
+    if font is None:
+        if _default is None:
+            _default = Font("narrow")
+        font = _default
+    if font.font not in _tables:
+        _tables[font.font] = Transliterator(font)
+    return _tables[font.font]
+
+
+def converter(text: str, font: Font = None) -> str:
+    """
+    Replace all characters <font> has no glyphs for with their closest ASCII representation
+    """
+    return text.translate(table(font))
+
+
+def convert_all(texts: list, font: Font = None) -> list:
+    """
+    Convert a list of texts with the same translation table
+    """
+    translation = table(font)
+    return [text.translate(translation) for text in texts]
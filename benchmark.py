@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for rendering, diffing and flipping. The display is driven by the simulated GPIO backend, so this runs
+without the hardware and also reports the pin writes, pulses and the simulated time the display needs per frame.
+
+    python benchmark.py                      run all benchmarks
+    python benchmark.py -k show              run only benchmarks with "show" in their name
+    python benchmark.py --save base.json     store the results as a baseline
+    python benchmark.py --compare base.json  compare the results with a stored baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import subprocess
+import time
+
+import flipdot
+from flipdot.framebuf import FrameBuffer
+from flipdot.pages import PagePipeline
+from flipdot.scheduler import Entry, Scheduler
+from flipdot.simulator import SimulatedGPIO
+from server import Server
+
+TEXT_SHORT = "12:34:56"
+TEXT_LONG = "The quick brown fox jumps over the lazy dog. " * 4
+
+benchmarks = {}  # name -> function that prepares the benchmark and returns the callable to measure
+
+
+def benchmark(name: str):
+    # register a benchmark
+    def register(function):
+        benchmarks[name] = function
+        return function
+    return register
+
+
+def random_buffer(width: int, height: int, density: float, seed: int) -> FrameBuffer:
+    rand = random.Random(seed)
+    buffer = FrameBuffer(width, height)
+    for x in range(width):
+        for y in range(height):
+            buffer.set_pixel(x, y, rand.random() < density)
+    return buffer
+
+
+class Context:
+    """
+    Everything the benchmarks need: a display on the simulated backend and a server for it
+    """
+    def __init__(self):
+        self.gpio = SimulatedGPIO()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.display = flipdot.FlipDot(backend=self.gpio, parallel_panels=3)
+            self.server = Server(self.display, port=0)
+        self.font = self.display.fonts["variable"]
+        self.frames = [random_buffer(self.display.width, self.display.height, 0.5, seed) for seed in range(8)]
+
+
+@benchmark("font.text short")
+def bench_font_short(ctx: Context):
+    return lambda: ctx.font.text(TEXT_SHORT)
+
+
+@benchmark("font.text long")
+def bench_font_long(ctx: Context):
+    return lambda: ctx.font.text(TEXT_LONG)
+
+
+@benchmark("font.fit long")
+def bench_font_fit(ctx: Context):
+    # what drawing a text measures before it draws: cut off, then the width for the alignment
+    def run():
+        text = ctx.font.fit(TEXT_LONG, 84)
+        ctx.font.textwidth(text)
+    return run
+
+
+@benchmark("font.draw short")
+def bench_font_draw(ctx: Context):
+    target = FrameBuffer(84, 7)
+    return lambda: ctx.font.draw(target, TEXT_SHORT, 20, 0)
+
+
+@benchmark("framebuf.copy_buffer")
+def bench_copy(ctx: Context):
+    target = FrameBuffer(84, 7)
+    return lambda: target.copy_buffer(ctx.frames[0], 0, 0)
+
+
+@benchmark("framebuf.copy_buffer offset")
+def bench_copy_offset(ctx: Context):
+    target = FrameBuffer(84, 24)
+    return lambda: target.copy_buffer(ctx.frames[0], 3, 8)
+
+
+@benchmark("framebuf.scroll horizontal")
+def bench_scroll_x(ctx: Context):
+    buffer = random_buffer(84, 7, 0.5, 1)
+    return lambda: buffer.scroll(-1, 0)
+
+
+@benchmark("framebuf.scroll vertical")
+def bench_scroll_y(ctx: Context):
+    buffer = random_buffer(84, 24, 0.5, 1)
+    return lambda: buffer.scroll(0, -1)
+
+
+@benchmark("framebuf.diff")
+def bench_diff(ctx: Context):
+    return lambda: ctx.frames[0].diff(ctx.frames[1])
+
+
+@benchmark("show sparse")
+def bench_show_sparse(ctx: Context):
+    display = ctx.display
+    state = {"color": 0}
+
+    def run():
+        state["color"] ^= 1
+        display.set_pixel(10, 3, state["color"])
+        display.show(avoid_dead=False)
+    return run
+
+
+@benchmark("show dense")
+def bench_show_dense(ctx: Context):
+    display = ctx.display
+    state = {"frame": 0}
+
+    def run():
+        state["frame"] = (state["frame"] + 1) % len(ctx.frames)
+        display.copy_buffer(ctx.frames[state["frame"]], 0, 0)
+        display.show(avoid_dead=False)
+    return run
+
+
+@benchmark("show keyframe")
+def bench_show_keyframe(ctx: Context):
+    return lambda: ctx.display.show(keyframe=True, avoid_dead=False)
+
+
+@benchmark("transition_scroll")
+def bench_transition_scroll(ctx: Context):
+    display = ctx.display
+
+    def run():
+        display.text(random.choice(["1st Place:", "12345 Points", "Last hour:"]), show=False)
+        display.transition_scroll()
+    return run
+
+
+@benchmark("pages.show_next")
+def bench_pages(ctx: Context):
+    # like transition_scroll, but with the pages rendered in the background
+    pages = [("1st Place:", 0), ("12345 Points", 0), ("Last hour:", 0)]
+    pipeline = PagePipeline(ctx.display, lambda: pages)
+    pipeline.start()
+    return pipeline.show_next
+
+
+@benchmark("transition_random")
+def bench_transition_random(ctx: Context):
+    display = ctx.display
+
+    def run():
+        display.text(random.choice(["Mon 01. Jan 12:34", "Tue 02. Feb 23:45"]), show=False)
+        display.transition_random(sleep_between_pixels=0)
+    return run
+
+
+@benchmark("ticker")
+def bench_ticker(ctx: Context):
+    return lambda: ctx.display.ticker("Hello World", fps=None)
+
+
+@benchmark("server.jsonparse setpixel")
+def bench_jsonparse(ctx: Context):
+    pixels = [{"x": x, "y": x % 7, "c": 1} for x in range(0, 84, 4)]
+    clear = [{"x": x, "y": x % 7, "c": 0} for x in range(0, 84, 4)]
+    state = {"toggle": False}
+
+    def run():
+        state["toggle"] = not state["toggle"]
+        ctx.server.jsonparse({"setpixel": pixels if state["toggle"] else clear})
+    return run
+
+
+@benchmark("server.jsonparse status")
+def bench_jsonparse_status(ctx: Context):
+    return lambda: ctx.server.jsonparse({"light": None, "text": None, "mode": None})
+
+
+@benchmark("main loop clock")
+def bench_main_loop(ctx: Context):
+    display = ctx.display
+    scheduler = Scheduler(display, [Entry("clock", 3600)])
+
+    def run():
+        # same as one wakeup of the main.py loop, with the clock forced to redraw
+        display.lastClock = 0
+        scheduler.loop(standby=False)
+    return run
+
+
+@benchmark("server.handle_http status")
+def bench_http_status(ctx: Context):
+    request = b"GET /json HTTP/1.1\r\nHost: flipdot\r\n\r\n"
+    return lambda: ctx.server.handle_http(request)
+
+
+@benchmark("server.handle_http pixels")
+def bench_http_pixels(ctx: Context):
+    request = b"GET /pixels HTTP/1.1\r\nHost: flipdot\r\n\r\n"
+    return lambda: ctx.server.handle_http(request)
+
+
+@benchmark("server.handle_http frame")
+def bench_http_frame(ctx: Context):
+    requests = [b"POST /frame HTTP/1.1\r\nContent-Type: application/octet-stream\r\n\r\n" + bytes(frame._buf)
+                for frame in ctx.frames]
+    state = {"frame": 0}
+
+    def run():
+        state["frame"] = (state["frame"] + 1) % len(requests)
+        ctx.server.handle_http(requests[state["frame"]])
+    return run
+
+
+def measure(ctx: Context, name: str, mintime: float) -> dict:
+    with contextlib.redirect_stdout(io.StringIO()):
+        run = benchmarks[name](ctx)
+        run()  # warm up
+        ctx.gpio.reset_stats()
+        ops = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < mintime:
+            run()
+            ops += 1
+            elapsed = time.perf_counter() - start
+    return {
+        "ops_per_sec": ops / elapsed,
+        "us_per_op": elapsed / ops * 1e6,
+        "writes_per_op": ctx.gpio.writes / ops,
+        "pulses_per_op": ctx.gpio.pulses / ops,
+        "sim_ms_per_op": ctx.gpio.clock_ns / ops / 1e6,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the flipdot driver on the simulated display")
+    parser.add_argument("-k", dest="keyword", default="", help="only run benchmarks containing this string")
+    parser.add_argument("--time", type=float, default=0.5, help="minimum run time per benchmark in seconds")
+    parser.add_argument("--save", metavar="FILE", help="store the results as baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results with a stored baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            stored = json.load(f)
+        baseline = stored["results"]
+        print(f"Comparing with baseline of revision {stored['revision']}")
+
+    ctx = Context()
+    results = {}
+    print(f"{'benchmark':32} {'ops/s':>10} {'µs/op':>10} {'writes':>8} {'pulses':>8} {'sim ms':>8}")
+    for name in benchmarks:
+        if args.keyword not in name:
+            continue
+        try:
+            result = measure(ctx, name, args.time)
+        except Exception as e:
+            print(f"{name:32} failed: {e!r}")
+            continue
+        results[name] = result
+        line = (f"{name:32} {result['ops_per_sec']:10.1f} {result['us_per_op']:10.1f} "
+                f"{result['writes_per_op']:8.1f} {result['pulses_per_op']:8.1f} {result['sim_ms_per_op']:8.2f}")
+        if name in baseline:
+            line += f"   {result['ops_per_sec'] / baseline[name]['ops_per_sec']:6.2f}x"
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"revision": git_revision(), "time": time.time(), "results": results}, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,321 @@
-import RPi.GPIO as GPIO
+import multiprocessing
+import os
+import signal
+import time
+import traceback
 
-GPIO.setmode(GPIO.BCM)
 
+def get_backend(name: str = None):
+    """
+    Returns the GPIO library to drive the display with
+    :param name:
+    "pigpio" for the pigpio daemon, "rpi" for RPi.GPIO in a separate process or "sim" for a simulated display.
+    Defaults to $FLIPDOT_GPIO, otherwise "pigpio" if the pigpio daemon runs and "rpi" if it doesn't.
+    An already created backend object is returned as it is
+    :return:
+    Module or object with the RPi.GPIO interface
+    """
+    if name is not None and not isinstance(name, str):
+        return name
+    if name is None:
+        name = os.environ.get("FLIPDOT_GPIO")
+    if name is None:
+        try:
+            return PigpioGPIO()
+        except (ImportError, RuntimeError) as e:
+            print(f"pigpio is not available ({e}), using RPi.GPIO")
+            name = "rpi"
+    if name == "pigpio":
+        return PigpioGPIO()
+    if name == "rpi":
+        return ProcessGPIO()
+    if name == "sim":
+        from .simulator import SimulatedGPIO
+        return SimulatedGPIO()
+    raise ValueError(f"Unknown GPIO backend {name}")
+
+
+class PigpioGPIO:
+    """
+    RPi.GPIO interface on top of the pigpio daemon. The daemon times the enable pulses with DMA, so their length
+    doesn't depend on which Python thread holds the GIL
+    """
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, host: str = "localhost", port: int = 8888) -> None:
+        import pigpio  # only available where the pigpio daemon runs
+        self.pigpio = pigpio
+        self.pi = pigpio.pi(host, port)
+        if not self.pi.connected:
+            raise RuntimeError("Can't connect to the pigpio daemon - is pigpiod running?")
+        self._waves = {}  # (channels, microseconds) -> id of the wave with that pulse
+
+    def setmode(self, mode: int) -> None:
+        pass
+
+    def setwarnings(self, warnings: bool) -> None:
+        pass
 
-def cleanup():
-    GPIO.cleanup()
+    def setup(self, channel: int, direction: int, initial: int = 0) -> None:
+        if direction == self.OUT:
+            self.pi.set_mode(channel, self.pigpio.OUTPUT)
+            self.pi.write(channel, int(bool(initial)))
+        else:
+            self.pi.set_mode(channel, self.pigpio.INPUT)
 
+    def input(self, channel: int) -> int:
+        return self.pi.read(channel)
 
-class Pin:
+    def output(self, channel, value) -> None:
+        # accepts a single channel or lists of channels and values like RPi.GPIO
+        if not isinstance(channel, (list, tuple)):
+            self.pi.write(channel, int(bool(value)))
+            return
+        if not isinstance(value, (list, tuple)):
+            value = [value] * len(channel)
+        high = low = 0
+        for channel, value in zip(channel, value):
+            if value:
+                high |= 1 << channel
+            else:
+                low |= 1 << channel
+        # all lines of a bank change at the same time
+        if low:
+            self.pi.clear_bank_1(low)
+        if high:
+            self.pi.set_bank_1(high)
+
+    def pulse(self, channels: list, microseconds: int) -> None:
+        """
+        Set <channels> high for exactly <microseconds> and wait until they are low again
+        """
+        key = (tuple(channels), microseconds)
+        wave = self._waves.get(key)
+        if wave is None:
+            mask = 0
+            for channel in channels:
+                mask |= 1 << channel
+            self.pi.wave_add_generic([self.pigpio.pulse(mask, 0, microseconds), self.pigpio.pulse(0, mask, 0)])
+            wave = self.pi.wave_create()
+            self._waves[key] = wave
+        self.pi.wave_send_once(wave)
+        # waiting longer only delays the next flip, the pulse itself is already over
+        time.sleep(microseconds / 1000000)
+        while self.pi.wave_tx_busy():
+            time.sleep(0.00005)
+
+    def cleanup(self) -> None:
+        self.pi.wave_clear()
+        self._waves = {}
+        self.pi.stop()
+
+
+class ProcessGPIO:
     """
-    Simplify the GPIO API and make it compatible with the micropython implementation
+    RPi.GPIO driven by a separate process. The process runs no other threads, so nothing takes the GIL away while
+    it times the enable pulses in a loop - no matter what the threads of the display software do meanwhile.
+    Calls are executed in order, only pulse() waits for the process
     """
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self) -> None:
+        # fork - with spawn the process would import main.py again, which starts everything at import
+        context = multiprocessing.get_context("fork")
+        self._connection, connection = context.Pipe()
+        self._process = context.Process(target=_pin_process, args=(connection, self._connection), name="flipdot-pins", daemon=True)
+        self._process.start()
+        connection.close()
+        self._call("setmode", self.BCM)  # raises here if RPi.GPIO can't be used
+
+    def _send(self, command: str, *args) -> None:
+        self._connection.send((command, args, False))
+
+    def _call(self, command: str, *args) -> None:
+        self._connection.send((command, args, True))
+        error = self._connection.recv()
+        if error is not None:
+            raise error
+
+    def setmode(self, mode: int) -> None:
+        pass
 
-    OUT = GPIO.OUT
-    IN = GPIO.IN
+    def setwarnings(self, warnings: bool) -> None:
+        self._send("setwarnings", warnings)
 
-    def __init__(self, gpio: int, direction: int, value: int = None) -> None:
+    def setup(self, channel: int, direction: int, initial: int = 0) -> None:
+        self._send("setup", channel, direction, initial)
+
+    def output(self, channel, value) -> None:
+        self._send("output", channel, value)
+
+    def pulse(self, channels: list, microseconds: int) -> None:
+        """
+        Set <channels> high for <microseconds> and wait until they are low again
+        """
+        self._call("pulse", list(channels), microseconds)
+
+    def cleanup(self) -> None:
+        if self._process.is_alive():
+            self._call("cleanup")  # ends the process
+        self._connection.close()
+        self._process.join()
+
+
+def _pin_process(connection, parent) -> None:
+    # runs in the process of ProcessGPIO: executes its calls until cleanup() or until the main process is gone
+    parent.close()  # the end of the main process, left open here it would keep the connection from closing
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is for the main process, which cleans up
+    try:
+        import RPi.GPIO as GPIO  # only available on the Raspberry Pi
+    except ImportError as e:
+        connection.recv()
+        connection.send(e)
+        return
+    while True:
+        try:
+            command, args, reply = connection.recv()
+        except EOFError:
+            return
+        error = None
+        try:
+            if command == "pulse":
+                channels, microseconds = args
+                GPIO.output(channels, [1] * len(channels))
+                # time.sleep is way too inaccurate for pulses this short, use a timestamp controlled loop instead
+                timestamp = time.time_ns() + microseconds * 1000
+                while timestamp > time.time_ns():
+                    pass
+                GPIO.output(channels, [0] * len(channels))
+            elif command == "setup":
+                channel, direction, initial = args
+                GPIO.setup(channel, GPIO.OUT if direction == ProcessGPIO.OUT else GPIO.IN, initial=initial)
+            elif command == "setmode":
+                GPIO.setmode(GPIO.BCM)
+            else:
+                getattr(GPIO, command)(*args)
+        except Exception as e:
+            error = e
+            if not reply:
+                traceback.print_exc()
+        if reply:
+            connection.send(error)
+        if command == "cleanup":
+            return
+
+
+class PinBank:
+    """
+    A set of named output pins that are written together with as few calls into the GPIO library as possible.
+    Pins are grouped (e.g. the address lines of a driver) and the levels for every address are precomputed,
+    so selecting an address is a table lookup and one bulk write of the lines that actually change.
+    """
+
+    def __init__(self, gpio) -> None:
+        """
+        :param gpio:
+        GPIO library to write to - RPi.GPIO or any object with the same setup/output/cleanup interface
+        """
         self.gpio = gpio
-        GPIO.setwarnings(False)
-        GPIO.setup(self.gpio, direction)
-        if value is not None:
-            GPIO.output(self.gpio, value)
+        self.gpio.setwarnings(False)
+        self.channels = {}  # pin name -> gpio number
+        self.levels = {}  # gpio number -> current level
+        self.groups = {}  # group name -> (tuple of gpio numbers, list of level tuples)
+        self.writes = 0  # number of lines written, for statistics
+        self.calls = 0  # number of calls into the GPIO library, for statistics
+        # the backend times pulses itself - otherwise Python does and other threads can stretch them
+        self.timed = hasattr(gpio, "pulse")
+
+    def add(self, name: str, gpio: int, value: int = 0) -> None:
+        """
+        Set up a pin as output
+        :param name:
+        Name to address the pin with
+        :param gpio:
+        GPIO number (BCM)
+        :param value:
+        Initial level of the pin
+        """
+        self.gpio.setup(gpio, self.gpio.OUT, initial=value)
+        self.channels[name] = gpio
+        self.levels[gpio] = value
+
+    def add_group(self, group: str, names: list, codes: list) -> None:
+        """
+        Combine pins to a group and precompute their levels
+        :param group:
+        Name of the group
+        :param names:
+        Names of the pins in the group, the first one gets the lowest bit of the code
+        :param codes:
+        The code to put on the pins for every index that can be selected
+        """
+        channels = tuple(self.channels[name] for name in names)
+        table = [tuple((code >> bit) & 1 for bit in range(len(names))) for code in codes]
+        self.groups[group] = (channels, table)
+
+    def select(self, group: str, index: int) -> None:
+        """
+        Put the precomputed levels for <index> on the pins of <group>
+        """
+        channels, table = self.groups[group]
+        self._output(channels, table[index])
+
+    def output(self, levels: dict) -> None:
+        """
+        Set several pins at once
+        :param levels:
+        Dictionary of pin name -> level
+        """
+        self._output([self.channels[name] for name in levels.keys()], list(levels.values()))
+
+    def on(self, name: str) -> None:
+        self._output((self.channels[name],), (1,))
+
+    def off(self, name: str) -> None:
+        self._output((self.channels[name],), (0,))
 
-    def value(self, value: int) -> None:
-        GPIO.output(self.gpio, value)
+    def _output(self, channels, values) -> None:
+        # write only the lines that are not at the right level already, all of them in one call
+        changed = [(channel, value) for channel, value in zip(channels, values) if self.levels[channel] != value]
+        if not changed:
+            return
+        if len(changed) == 1:
+            channel, value = changed[0]
+            self.gpio.output(channel, value)
+        else:
+            self.gpio.output([channel for channel, _ in changed], [value for _, value in changed])
+        for channel, value in changed:
+            self.levels[channel] = value
+        self.writes += len(changed)
+        self.calls += 1
 
-    def on(self) -> None:
-        GPIO.output(self.gpio, 1)
+    def pulse(self, names: list, microseconds: int) -> None:
+        """
+        Set the pins <names> high for <microseconds>, e.g. the enable pulse
+        """
+        channels = [self.channels[name] for name in names]
+        if self.timed:
+            self.gpio.pulse(channels, microseconds)
+            self.writes += 2 * len(channels)
+            self.calls += 1
+            return
+        self._output(channels, [1] * len(channels))
+        # time.sleep is way too inaccurate for pulses this short, use a timestamp controlled loop instead
+        timestamp = time.time_ns() + microseconds * 1000
+        while timestamp > time.time_ns():
+            pass
+        self._output(channels, [0] * len(channels))
 
-    def off(self) -> None:
-        GPIO.output(self.gpio, 0)
+    def cleanup(self) -> None:
+        """
+        Release all GPIOs
+        """
+        self.gpio.cleanup()
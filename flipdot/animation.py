@@ -0,0 +1,88 @@
+"""
+Frame-paced animations: an animation is a sequence of frames or pixel batches, each with the time it should be
+visible at. The engine keeps the wall-clock timing no matter how long the display needs to flip the dots, by
+dropping frames (or merging pixel batches) whenever it falls behind.
+"""
+import time
+
+from .framebuf import FrameBuffer
+
+
+class Animation:
+    def __init__(self, frames, fps: float = None, duration: float = None, count: int = None) -> None:
+        """
+        :param frames:
+        Iterable of items. An item is a FrameBuffer (the whole display), a list of (x, y, color) tuples (a pixel
+        batch) or a tuple of one of those and the time in seconds after the start it should be shown at
+        :param fps:
+        Frames per second for items without a time
+        :param duration:
+        Total duration of the animation in seconds for items without a time, needs the number of items
+        :param count:
+        Number of items if frames has no len()
+        """
+        self.frames = frames
+        self.interval = 0.0  # seconds between two items without a time - 0 plays as fast as possible
+        if duration is not None:
+            if count is None:
+                count = len(frames)
+            if count:
+                self.interval = duration / count
+        elif fps:
+            self.interval = 1 / fps
+        # statistics of the last play
+        self.shown = 0  # number of times the display was updated
+        self.dropped = 0  # number of items merged into a later update because the display was too slow
+        self.showtime = 0.0  # average time one update of the display took
+
+    def timeline(self):
+        # yields every item together with its time after the start
+        for i, item in enumerate(self.frames):
+            if isinstance(item, tuple):
+                yield item
+            else:
+                yield item, i * self.interval
+
+    def play(self, canvas: FrameBuffer, show, clock=time.monotonic, sleep=time.sleep) -> None:
+        """
+        Play the animation
+        :param canvas:
+        Framebuffer with the current contents of the display, the items are drawn onto it
+        :param show:
+        Function that writes the dirty columns of canvas to the display and clears them
+        :param clock:
+        Monotonic clock in seconds
+        :param sleep:
+        Function to wait for the next item
+        """
+        self.shown = 0
+        self.dropped = 0
+        self.showtime = 0.0
+        start = clock()
+        timeline = iter(self.timeline())
+        current = next(timeline, None)
+        while current is not None:
+            item, at = current
+            self._draw(canvas, item)  # draw before fetching the next item, generators may reuse their buffer
+            upcoming = next(timeline, None)
+            if upcoming is not None and upcoming[1] > at and clock() + self.showtime >= start + upcoming[1]:
+                # too late - the next item would be due before this one is on the display, merge it into the next
+                self.dropped += 1
+            else:
+                delay = start + at - clock()
+                if delay > 0:
+                    sleep(delay)
+                before = clock()
+                show(canvas)
+                # running average of the time a display update takes
+                self.showtime = (self.showtime * self.shown + clock() - before) / (self.shown + 1)
+                self.shown += 1
+            current = upcoming
+
+    @staticmethod
+    def _draw(canvas: FrameBuffer, item) -> None:
+        if isinstance(item, FrameBuffer):
+            canvas.copy_buffer(item, 0, 0)
+        else:
+            for x, y, color in item:
+                canvas.set_pixel(x, y, color)
@@ -0,0 +1,110 @@
+"""
+Read whole frames from uploaded data: the packed columns of a FrameBuffer (one byte per column for up to 8 rows,
+the LSB being the top pixel), the same base64 encoded, or a PBM image (plain P1 or binary P4).
+"""
+import base64
+import binascii
+
+from .framebuf import FrameBuffer
+
+
+def from_packed(data: bytes, width: int, height: int) -> FrameBuffer:
+    """
+    Returns a framebuffer with the packed columns in <data>
+    """
+    buffer = FrameBuffer(width, height)
+    if len(data) != buffer.buffersize:
+        raise ValueError(f"Expected {buffer.buffersize} bytes for {width} x {height} pixels, got {len(data)}")
+    # drop the bits below the last row
+    packed = int.from_bytes(data, "little") & buffer._bufmask
+    buffer._buf = bytearray(packed.to_bytes(buffer.buffersize, "little"))
+    return buffer
+
+
+def from_pbm(data: bytes) -> FrameBuffer:
+    """
+    Returns a framebuffer with the PBM image in <data>, black pixels (1) are set
+    """
+    magic = data[:2]
+    if magic not in (b"P1", b"P4"):
+        raise ValueError("Not a PBM image")
+    # header: magic, width and height separated by whitespace, comments start with # and end with the line
+    fields = []
+    position = 2
+    while len(fields) < 2:
+        while position < len(data) and data[position:position + 1].isspace():
+            position += 1
+        if data[position:position + 1] == b"#":
+            position = data.find(b"\n", position)
+            if position < 0:
+                raise ValueError("Incomplete PBM header")
+            continue
+        start = position
+        while position < len(data) and data[position:position + 1].isdigit():
+            position += 1
+        if start == position:
+            raise ValueError("Incomplete PBM header")
+        fields.append(int(data[start:position]))
+    width, height = fields
+    if width == 0 or height == 0:
+        raise ValueError("Empty PBM image")
+    # the raster has to be complete before the framebuffer is allocated, the header alone could ask for gigabytes
+    if magic == b"P4":
+        position += 1  # exactly one whitespace character before the raster
+        rowbytes = (width + 7) // 8
+        raster = data[position:position + rowbytes * height]
+        if len(raster) < rowbytes * height:
+            raise ValueError("Incomplete PBM raster")
+        buffer = FrameBuffer(width, height)
+        for y in range(height):
+            row = int.from_bytes(raster[y * rowbytes:(y + 1) * rowbytes], "big") >> (rowbytes * 8 - width)
+            for x in range(width):
+                if row >> (width - 1 - x) & 1:
+                    buffer.set_pixel(x, y, 1)
+    else:
+        # plain PBM: digits, whitespace and comments do not matter
+        pixels = bytearray()
+        for line in data[position:].splitlines():
+            pixels += bytes(char for char in line.split(b"#")[0] if char in b"01")
+        if len(pixels) < width * height:
+            raise ValueError("Incomplete PBM raster")
+        buffer = FrameBuffer(width, height)
+        for y in range(height):
+            for x in range(width):
+                if pixels[y * width + x] == ord("1"):
+                    buffer.set_pixel(x, y, 1)
+    return buffer
+
+
+def load(data: bytes, width: int, height: int, format: str = None) -> FrameBuffer:
+    """
+    Returns a <width> x <height> framebuffer from the uploaded <data>
+    :param format:
+    "raw" for packed columns, "base64" for base64 encoded packed columns or "pbm" for a PBM image (optionally base64
+    encoded). Guessed from the data if None
+    """
+    size = ((height - 1) // 8 + 1) * width
+    if format is None:
+        if len(data) == size:
+            format = "raw"
+        elif data[:2] in (b"P1", b"P4"):
+            format = "pbm"
+        else:
+            format = "base64"
+    if format not in ("raw", "base64", "pbm"):
+        raise ValueError(f"Unknown format {format}")
+    if format != "raw" and data[:2] not in (b"P1", b"P4"):
+        try:
+            data = base64.b64decode(data.strip(), validate=True)
+        except binascii.Error:
+            raise ValueError("Invalid base64 data") from None
+        if format == "base64" and len(data) != size and data[:2] in (b"P1", b"P4"):
+            format = "pbm"  # base64 encoded image
+    if format != "pbm":
+        return from_packed(data, width, height)
+    image = from_pbm(data)
+    if image.width == width and image.height == height:
+        return image
+    buffer = FrameBuffer(width, height)
+    buffer.copy_buffer(image, 0, 0)
+    return buffer
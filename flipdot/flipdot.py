@@ -1,15 +1,78 @@
+import queue
 import random
+import threading
 import time
+import traceback
 
 from .framebuf import FrameBuffer
 from .fonts import Font
+from .flipplan import FlipPlan, column_code
+from .animation import Animation
+from .modes import Mode, ClockMode, DayclockMode, AnimationMode
 from . import GPIO
-from furvester import Furvester
 
 DEADPIXEL = (45,5)
 
+# GPIO (BCM) numbers of all pins the display is wired to
+PINOUT = {
+    # Row drivers (74HTC238)
+    "RowA0": 19,
+    "RowA1": 16,
+    "RowA2": 26,
+    "RowSEL": 21,
+    "RowEN": 20,  # active low
+    # Column drivers (FP2800)
+    "A0": 13,
+    "A1": 12,
+    "A2": 6,
+    "B0": 7,
+    "B1": 8,
+    "DATA": 5,
+    # Panel select (by chosing the corresponding EN pin)
+    "EN0": 10,
+    "EN1": 9,
+    "EN2": 25,
+    "EN3": 23,
+    "VsEN": 24,
+}
+
+def _state(name: str) -> property:
+    # attribute of the display state - changing it counts up the state version
+    attribute = "_" + name
+
+    def get(self):
+        return getattr(self, attribute)
+
+    def set(self, value) -> None:
+        if getattr(self, attribute, None) != value:
+            setattr(self, attribute, value)
+            self.stateVersion += 1
+    return property(get, set)
+
+
+class Frame:
+    """
+    A committed frame waiting to be written to the display
+    """
+    def __init__(self, buffer: FrameBuffer, columns: list, keyframe: bool = False, slow: bool = False,
+                 effect: str = None, params: dict = None) -> None:
+        self.buffer = buffer  # copy of the framebuffer
+        self.columns = columns  # columns changed since the previous frame
+        self.keyframe = keyframe
+        self.slow = slow
+        self.effect = effect
+        self.params = params or {}
+
+
 class FlipDot(FrameBuffer):
-    def __init__(self, height: int = 7, width: int = 84, panels: int = 3, upside_down: bool = True) -> None:
+    # the state shown by the web interface, stateVersion counts up whenever one of them changes
+    mode = _state("mode")
+    lastText = _state("lastText")
+    font = _state("font")
+    align = _state("align")
+
+    def __init__(self, height: int = 7, width: int = 84, panels: int = 3, upside_down: bool = True,
+                 parallel_panels: int = 1, backend: str = None, queue_size: int = 2) -> None:
         """
         :param height:
         Height of the display in pixels
@@ -19,12 +82,21 @@ class FlipDot(FrameBuffer):
         Number of panels in the display
         :param upside_down:
         Turns the whole display by 180°
+        :param parallel_panels:
+        Maximum number of panels that get flipped with the same pulse - limited by the VS supply
+        :param backend:
+        GPIO backend: "pigpio" or "rpi" for the real display, "sim" for a simulated one.
+        Defaults to $FLIPDOT_GPIO, otherwise "pigpio" with "rpi" as fallback if the pigpio daemon doesn't run
+        :param queue_size:
+        Number of committed frames that can wait for the driver thread
         """
+        self.stateVersion = 0
         self.height = height
         self.width = width
         self.panels = panels
         self.panelwidth = self.width // self.panels
         self.upside_down = upside_down
+        self.parallel_panels = max(1, min(parallel_panels, self.panels))
 
         self.pulsetime = 250  # length of enable pulse in µs - 250µs works reliable. Avoid too long!!!
         self.powerTimeout = 2000  # how long to keep flipdot VS on after the last update (in ms)
@@ -34,10 +106,19 @@ class FlipDot(FrameBuffer):
         self.lastClock = time.time()
         self.lastText = ""
         self.standby = False
-        self.furvester = Furvester(self)
+        self.modes = {}  # name -> Mode, see register_mode()
+        self._activeMode = None  # mode of the last loop() call
+        self.animation = None  # uploaded animation for the mode "animation": list of (FrameBuffer, seconds)
+        self.animationRepeat = False  # play the uploaded animation in a loop
+        self.animationNext = 0  # time to start the uploaded animation (again), None if it was played
+
+        self.register_mode("clock", ClockMode())
+        self.register_mode("dayclock", DayclockMode(seconds=False))
+        self.register_mode("dayclock2", DayclockMode(seconds=True))
+        self.register_mode("animation", AnimationMode())
 
         # Pin initialization
-        self.pins = {}
+        self.pins = GPIO.PinBank(GPIO.get_backend(backend))
         self._init_pins()
 
         # Initialize Fonts
@@ -60,6 +141,19 @@ class FlipDot(FrameBuffer):
         self.lastRow = -1
         self.lastColumn = -1
         self.lastColor = -1
+        self.lastPlan = FlipPlan()  # plan of the last show, keeps the statistics
+        self.lastAnimation = None  # last animation played, keeps the statistics
+
+        # Version of the frame on the display, counts up with every change of the dots. displayed holds the version
+        # together with a copy of the columns and is replaced as a whole, so other threads can read it any time
+        self.version = 0
+        self.displayed = (self.version, bytes(self.lastBuffer._buf))
+        self._listeners = ()  # called with the version and the changed columns after every change of the display
+
+        # Committed frames waiting for the driver thread, which is started with start()
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._committed = None  # contents of the framebuffer at the last commit
 
         # Clear the display
         self.clear()
@@ -86,54 +180,108 @@ class FlipDot(FrameBuffer):
         :param vpos:
         vertical position of the first pixel
         """
-        if align is None:
-            align = self.align
-        elif align not in ["left", "center", "right"]:
-            raise ValueError("align must be left, center or right")
         # write text to framebuffer
         if clear:
             self.clear()
-
-        if font is None:
-            font = self.font
-
-        buf = self.fonts[font].text(text)
-        if cutoff:
-            cuttext = text
-            while buf.width > self.width:
-                cuttext = cuttext[:-1]
-                print(text)
-                buf = self.fonts[font].text(cuttext + "...")
-        self.copy_buffer(buf, self._x_align(buf.width, align), vpos)
+        self._draw_text(self, text, align, font, vpos, cutoff)
 
         if show:
             self.show()
 
         self.lastText = text
 
-    def ticker(self, text: str, font=None) -> None:
+    def render(self, text: str, align: str = None, font: str = None, vpos: int = 0,
+               cutoff: bool = True) -> FrameBuffer:
+        """
+        Returns a new framebuffer with the text like text() would draw it, without touching the display
+        """
+        buffer = FrameBuffer(self.width, self.height)
+        self._draw_text(buffer, text, align, font, vpos, cutoff)
+        return buffer
+
+    def _draw_text(self, target: FrameBuffer, text: str, align: str, font: str, vpos: int, cutoff: bool) -> None:
+        if align is None:
+            align = self.align
+        elif align not in ["left", "center", "right"]:
+            raise ValueError("align must be left, center or right")
+        if font is None:
+            font = self.font
+
+        drawtext = text
+        if cutoff:
+            drawtext = self.fonts[font].fit(text, self.width)
+        width = self.fonts[font].textwidth(drawtext)
+        self.fonts[font].draw(target, drawtext, self._x_align(width, align), vpos)
+
+    def ticker(self, text: str, font=None, fps: float = 20) -> None:
         """
         Display text in newsticker style, slowly running it over the display
         :param text:
         Text to display
         :param font:
         font to be used
+        :param fps:
+        columns per second the text moves
         """
         if font is None:
             font = self.font
-        textbuf, width, height = self.fonts[font].text(text)
-        self.clear()
-        self.show()
-        step = 0
-        for i in range(self.width + width):
-            pos_x = self.width - step
-            # self.fill(0)
-            self.copy_buffer(textbuf, pos_x, 0)
-            self.show()
-            # time.sleep(0.1 / speed)
-            step += 1
+        self.clear()  # the text runs off the display, it is empty afterwards
+        self.commit(effect="ticker", text=text, font=self.fonts[font], fps=fps)
+
+    def _ticker(self, buffer: FrameBuffer, text: str, font: Font, fps: float = 20) -> Animation:
+        width = font.textwidth(text)
+
+        def frames():
+            frame = FrameBuffer(self.width, self.height)
+            for step in range(self.width + width):
+                frame.fill(0)
+                font.draw(frame, text, self.width - step, 0)
+                yield frame
+        return Animation(frames(), fps=fps)
 
-    def show(self, keyframe: bool = False, slow: bool = False, avoid_dead: bool = True) -> None:
+    def play_animation(self, frames: list, repeat: bool = False) -> None:
+        """
+        Store an animation and switch to the mode "animation", which plays it from the display loop
+        :param frames:
+        List of (FrameBuffer, seconds) - every frame is shown for its number of seconds
+        :param repeat:
+        Play the animation in a loop instead of keeping the last frame on the display,
+        the frames must take some time then
+        """
+        if repeat and sum(seconds for _, seconds in frames) <= 0:
+            raise ValueError("A repeated animation needs a duration")
+        self.animation = list(frames)
+        self.animationRepeat = repeat
+        self.animationNext = 0
+        self.mode = "animation"
+
+    def animate(self) -> float | None:
+        """
+        Start the stored animation if it is due
+        :return:
+        Time (as returned by time.time()) to start the animation again, None if it is not repeated
+        """
+        if not self.animation or self.animationNext is None:
+            return None
+        if self.animationNext <= time.time():
+            # the framebuffer ends up with the last frame, like the display after the animation
+            self.copy_buffer(self.animation[-1][0], 0, 0)
+            self.commit(effect="animation", frames=self.animation)
+            if self.animationRepeat:
+                self.animationNext = time.time() + sum(seconds for _, seconds in self.animation)
+            else:
+                self.animationNext = None
+        return self.animationNext
+
+    def _animation(self, buffer: FrameBuffer, frames: list) -> Animation:
+        timeline = []
+        at = 0.0
+        for frame, seconds in frames:
+            timeline.append((frame, at))
+            at += seconds
+        return Animation(timeline)
+
+    def show(self, keyframe: bool = False, slow: bool = False, avoid_dead: bool = True, wait: bool = False) -> None:
         """
         draw the whole framebuffer to the display
         :param avoid_dead:
@@ -142,49 +290,216 @@ class FlipDot(FrameBuffer):
         overwrite the whole display, no matter if pixels are already set
         :param slow:
         slow down the process to keep noise a little lower
+        :param wait:
+        wait until the frame is on the display if the driver thread is running
         :return:
         """
         if avoid_dead:
             self._avoid_dead_pixel()
-        for col in range(self.width // self.panels):
-            for row in range(self.height):
-                for panel in range(self.panels):
-                    # check if the selected pixel changed or keyframe is set
-                    phycol = col + panel * self.panelwidth
-                    if self.get_pixel(phycol, row) != self.lastBuffer.get_pixel(phycol, row) or keyframe is True:
-                        self.flip(phycol, row, self.get_pixel(phycol, row))  # flip it
-                        if slow:
-                            time.sleep(0.01)
-        self.lastBuffer.copy_buffer(self, 0, 0)  # after writing the display, store current image for next compare
+        self.commit(keyframe=keyframe, slow=slow)
+        if wait:
+            self.sync()
+
+    def commit(self, keyframe: bool = False, slow: bool = False, effect: str = None, **params) -> None:
+        """
+        Hand the current contents of the framebuffer over to the display driver. If the driver thread is running
+        this returns immediately, otherwise the frame is written before returning.
+        If frames are committed faster than the display can flip them, frames that were not started yet are
+        dropped in favor of the latest one. Committing the same contents again without an effect does nothing
+        :param keyframe:
+        overwrite the whole display, no matter if pixels are already set
+        :param slow:
+        slow down the process to keep noise a little lower
+        :param effect:
+        transition effect to show the frame with: None, "scroll", "random", "ticker" or "animation"
+        :param params:
+        parameters for the effect
+        """
+        if effect is None and not keyframe and self._buf == self._committed:
+            self.clear_dirty()
+            return
+        self._committed = bytes(self._buf)
+        frame = Frame(FrameBuffer(self.width, self.height, bytearray(self._buf)), self.dirty_columns(),
+                      keyframe, slow, effect, params)
+        self.clear_dirty()
+        if self._worker is None:
+            self._display(frame)
+            return
+        while True:
+            try:
+                self._frames.put_nowait(frame)
+                return
+            except queue.Full:
+                # latest frame wins - drop the oldest waiting frame but keep track of the columns it changed
+                try:
+                    dropped = self._frames.get_nowait()
+                except queue.Empty:
+                    continue
+                self._frames.task_done()
+                frame.columns = sorted(set(frame.columns).union(dropped.columns))
+                frame.keyframe = frame.keyframe or dropped.keyframe
+
+    def sync(self) -> None:
+        """
+        Wait until all committed frames are on the display
+        """
+        if self._worker is not None:
+            self._frames.join()
+
+    def start(self) -> None:
+        """
+        Start the driver thread. From now on only the driver thread writes to the display, committing a frame
+        doesn't wait for the dots to flip anymore.
+        Only backends that time the enable pulses themselves get a driver thread - with RPi.GPIO used directly the
+        pulses are timed by a Python loop, which other threads could stretch beyond what the coils take
+        """
+        if not self.pins.timed:
+            print("The GPIO backend can't time the pulses, writing to the display without a driver thread")
+            return
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="flipdot-driver", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        # driver thread: write committed frames to the display, power off when idle
+        while True:
+            try:
+                frame = self._frames.get(timeout=self.powerTimeout / 1000)
+            except queue.Empty:
+                self._power_off()
+                continue
+            try:
+                if frame is None:
+                    return
+                self._display(frame)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self._frames.task_done()
+
+    def _display(self, frame: 'Frame') -> None:
+        # write a committed frame to the display using its effect
+        effects = {
+            "scroll": self._transition_scroll,
+            "random": self._transition_random,
+            "ticker": self._ticker,
+            "animation": self._animation,
+        }
+        if frame.effect in effects:
+            animation = effects[frame.effect](frame.buffer, **frame.params)
+            self._play(animation)
+            columns = range(self.width)  # make sure the animation ends with the committed frame
+        elif frame.keyframe:
+            columns = range(self.width)
+        else:
+            columns = frame.columns
+        self._show_buffer(frame.buffer, columns, frame.keyframe, frame.slow)
         self._power_off()
 
-    def _avoid_dead_pixel(self):
+    def _play(self, animation: Animation) -> None:
+        # play an animation on the display, starting from what is on the display right now
+        canvas = FrameBuffer(self.width, self.height, bytearray(self.lastBuffer._buf))
+        canvas.clear_dirty()
+
+        def show(buffer: FrameBuffer) -> None:
+            self._show_buffer(buffer, buffer.dirty_columns())
+            buffer.clear_dirty()
+        animation.play(canvas, show)
+        self.lastAnimation = animation
+
+    def _show_buffer(self, buffer: FrameBuffer, columns, keyframe: bool = False, slow: bool = False) -> None:
+        # flip all pixels in <columns> that differ between <buffer> and the display
+        # collect the changed pixels in a flip plan which groups and orders them to save GPIO writes
+        plan = FlipPlan(self.parallel_panels)
+        changed_columns = []  # columns that look different afterwards
+        for col in columns:
+            column = buffer._get_column(col)
+            difference = (column ^ self.lastBuffer._get_column(col)) & self._colmask
+            if difference:
+                changed_columns.append(col)
+            changed = self._colmask if keyframe else difference
+            row = 0
+            while changed:
+                if changed & 1:
+                    plan.add(*self._physical(col, row), (column >> row) & 1)
+                changed >>= 1
+                row += 1
+            self.lastBuffer._set_column(col, column)  # store the column for the next compare
+        plan.compile(self.lastColumn, self.lastRow, self.lastColor)
+        for address, row, color, panels in plan:
+            self._flip_panels(address, row, color, panels)
+            if slow:
+                time.sleep(0.01)
+        self.lastPlan = plan
+        if changed_columns:
+            self._publish(changed_columns)
+
+    def _publish(self, columns: list) -> None:
+        # count up the frame version and tell all listeners about the changed columns
+        self.version += 1
+        self.displayed = (self.version, bytes(self.lastBuffer._buf))
+        for listener in self._listeners:
+            try:
+                listener(self.version, columns)
+            except Exception:
+                traceback.print_exc()
+
+    def subscribe(self, listener) -> None:
+        """
+        Call <listener> with the frame version and the list of changed columns whenever the dots on the display
+        changed. Listeners are called by the thread writing to the display and must return quickly
+        """
+        self._listeners = self._listeners + (listener,)
+
+    def unsubscribe(self, listener) -> None:
+        """
+        Stop calling <listener> on changes of the display
+        """
+        self._listeners = tuple(known for known in self._listeners if known is not listener)
+
+    def _avoid_dead_pixel(self, buffer: FrameBuffer = None):
+        # move the contents of <buffer> (the framebuffer by default) away from the dead pixel if possible
+        if buffer is None:
+            buffer = self
         x, y = DEADPIXEL
-        if self.get_pixel(x, y):
-            if not self.get_pixel(x - 1, y):
-                self.scroll(1, 0)
-            elif not self.get_pixel(x + 1, y):
-                self.scroll(-1, 0)
+        if buffer.get_pixel(x, y):
+            if not buffer.get_pixel(x - 1, y):
+                buffer.scroll(1, 0)
+            elif not buffer.get_pixel(x + 1, y):
+                buffer.scroll(-1, 0)
 
-    def transition_scroll(self, reverse: bool = False) -> None:
+    def transition_scroll(self, reverse: bool = False, duration: float = None) -> None:
         """
         Show the new contents by scrolling them into the display
         :param reverse:
         reverse direction of the animation
+        :param duration:
+        duration of the whole animation in seconds, as fast as possible if None
         """
         self._avoid_dead_pixel()
+        self.commit(effect="scroll", reverse=reverse, duration=duration)
+
+    def _transition_scroll(self, buffer: FrameBuffer, reverse: bool = False, duration: float = None,
+                           previous: FrameBuffer = None) -> Animation:
+        # scroll from <previous> (what is on the display by default) to <buffer>
+        if previous is None:
+            previous = self.lastBuffer
         if reverse is True:
             direction = 1
         else:
             direction = -1
         buf = FrameBuffer(self.width, (self.height + 1) * 3)
-        buf.copy_buffer(self.lastBuffer, 0, self.height + 1)
-        buf.copy_buffer(self, 0, 0)
-        buf.copy_buffer(self, 0, (self.height + 1) * 2)
-        for _ in range(self.height + 1):
-            buf.scroll(0, direction)
-            self.copy_buffer(buf, 0, -(self.height + 1))
-            self.show(avoid_dead=False)
+        buf.copy_buffer(previous, 0, self.height + 1)
+        buf.copy_buffer(buffer, 0, 0)
+        buf.copy_buffer(buffer, 0, (self.height + 1) * 2)
+
+        def frames():
+            step = FrameBuffer(self.width, self.height)
+            for _ in range(self.height + 1):
+                buf.scroll(0, direction)
+                step.copy_buffer(buf, 0, -(self.height + 1))
+                yield step
+        return Animation(frames(), duration=duration, count=self.height + 1)
 
     def transition_random(self, sleep_between_pixels: float = None, transition_time: float = None) -> None:
         """
@@ -195,21 +510,27 @@ class FlipDot(FrameBuffer):
         Time for the whole transition so the animation is played faster the more pixels need to change
         """
         self._avoid_dead_pixel()
+        self.commit(effect="random", sleep_between_pixels=sleep_between_pixels, transition_time=transition_time)
+
+    def _transition_random(self, buffer: FrameBuffer, sleep_between_pixels: float = None,
+                           transition_time: float = None) -> Animation:
+        pixels = list(range(self.width * self.height))
+        random.shuffle(pixels)
+        # one pixel batch for every pixel that needs to change
+        changes = []
+        for pixel in pixels:
+            x = pixel % self.width
+            y = pixel // self.width
+            color = buffer.get_pixel(x, y)
+            if color != self.lastBuffer.get_pixel(x, y):
+                changes.append([(x, y, color)])
         if transition_time is not None:
-            diff = self.diff(self.lastBuffer)
+            diff = max(len(changes), 1)
             if sleep_between_pixels is None or transition_time / diff > sleep_between_pixels:
                 sleep_between_pixels = transition_time / diff
         elif sleep_between_pixels is None:
             sleep_between_pixels = 0.01
-        pixels = list(range(82 * 7))
-        random.shuffle(pixels)
-        for pixel in pixels:
-            x = pixel % 82
-            y = pixel % 7
-            if self.get_pixel(x, y) != self.lastBuffer.get_pixel(x, y):
-                self.flip(x, y, self.get_pixel(x, y))  # flip it
-                time.sleep(sleep_between_pixels)
-        self.lastBuffer.copy_buffer(self, 0, 0)
+        return Animation(changes, fps=1 / sleep_between_pixels if sleep_between_pixels else None)
 
     def flip(self, column, row, color) -> None:
         """
@@ -221,18 +542,25 @@ class FlipDot(FrameBuffer):
         :param color:
         new color of the pixel
         """
-        # make sure power is on
-        self._power_on()
-        # set one pixel
+        panel, address, row = self._physical(column, row)
+        self._flip_panels(address, row, color, [panel])
+
+    def _physical(self, column: int, row: int) -> tuple:
+        # returns panel, column on the panel and row of a pixel as they are wired
         if self.upside_down:  # check if the panel is upside-down - if so flip the coordinates
             row = self.height - 1 - row
             column = self.width - 1 - column
-        panel = int(column / 28)  # find out which panel we're on
+        return column // self.panelwidth, column % self.panelwidth, row
+
+    def _flip_panels(self, address: int, row: int, color: bool | int, panels: list) -> None:
+        # flip the pixel at column <address> and <row> on all <panels> with a single pulse
+        # make sure power is on
+        self._power_on()
         # timer1 = time.time_ns()
-        self._select_column(column)  # set the column bits
+        self._select_column(address)  # set the column bits
         self._select_row(row)  # set the row bits
         self._select_color(color)  # set the color
-        self._pulse(panel)  # pulse the enable pin for the right panel
+        self._pulse(panels)  # pulse the enable pins for the right panels
         # timer2 = time.time_ns()
         self.lastUpdate = time.time()
         # print((timer2 - timer1)/1000)
@@ -244,25 +572,30 @@ class FlipDot(FrameBuffer):
         self.lastClock = 0
         self.fill(0)
 
-    def loop(self, standby: bool = False) -> None:
+    def loop(self, standby: bool = False) -> float | None:
         """
         Update the display with the latest changes
-        Run this as often as possible
+        Run this when the returned time is reached or when the mode or standby changed
         :param standby:
         The display will turn black and stop updating on its own, if this is True
+        :return:
+        Time (as returned by time.time()) when the current mode needs to update the display again,
+        None if it only needs to update after a change
         """
+        nextupdate = None
         if not standby:
             if self.standby:
                 print("Active Mode")
                 self.standby = False
-            if self.mode == "clock":
-                self.clock()
-            if self.mode == "dayclock":
-                self.dayclock(seconds=False)
-            if self.mode == "dayclock2":
-                self.dayclock(seconds=True)
-            if self.mode == "furvester":
-                self.furvester.screen()
+            mode = self.modes.get(self.mode)  # modes without a registered Mode (like "draw") don't update
+            if mode is not self._activeMode:
+                if self._activeMode is not None:
+                    self._activeMode.stop(self)
+                self._activeMode = mode
+                if mode is not None:
+                    mode.start(self)
+            if mode is not None:
+                nextupdate = mode.update(self)
         else:
             if not self.standby:
                 print("Standby Mode")
@@ -270,8 +603,16 @@ class FlipDot(FrameBuffer):
                 self.show(slow=True)
                 self.standby = True
 
-        if self.lastUpdate + 2 < time.time():
+        # without the driver thread nobody else turns off the power after the last update
+        if self._worker is None and self.lastUpdate + self.powerTimeout / 1000 < time.time():
             self._power_off()
+        return nextupdate
+
+    def register_mode(self, name: str, mode: Mode) -> None:
+        """
+        Make <mode> available as self.mode = <name>
+        """
+        self.modes[name] = mode
 
     def clock(self) -> None:
         """
@@ -309,24 +650,28 @@ class FlipDot(FrameBuffer):
         """
         self.clear()
         self.show()
+        if self._worker is not None:
+            self._frames.put(None)  # let the driver thread finish all frames and exit
+            self._worker.join()
+            self._worker = None
         self._power_off()
-        GPIO.cleanup()
+        self.pins.cleanup()
         del self
 
     def _power_on(self) -> None:
         # Enable Flip Dot VS if off right now
         if not self.power:
             self.power = True
-            self.pins["VsEN"].on()  # enable Vs
-            self.pins["RowEN"].off()  # enable row drivers
+            self.pins.on("VsEN")  # enable Vs
+            self.pins.off("RowEN")  # enable row drivers
             # print("Rows ON")
 
     def _power_off(self) -> None:
         # Disable Flip Dot VS
         if self.power:
             self.power = False
-            self.pins["RowEN"].on()  # disable row drivers
-            self.pins["VsEN"].off()  # disable Vs
+            self.pins.on("RowEN")  # disable row drivers
+            self.pins.off("VsEN")  # disable Vs
             # print("Rows OFF")
 
     def _x_align(self, width: int, align: str) -> int:
@@ -350,69 +695,40 @@ class FlipDot(FrameBuffer):
         # switch row drivers (74HCT238) to the right address
         if row != self.lastRow:  # check if the row actually changed, if not do nothing
             # Set the address bits
-            self.pins["RowA0"].value((row >> 0) % 2)
-            self.pins["RowA1"].value((row >> 1) % 2)
-            self.pins["RowA2"].value((row >> 2) % 2)
+            self.pins.select("row", row)
             # Store for next run
             self.lastRow = row
 
     def _select_column(self, column: int) -> None:
         # switch column drivers (FP2800A) to the right address
         if column != self.lastColumn:  # check if the column actually changed, if not do nothing
-            # FP2800 is subdivided into 4 "characters" (B0, B1) with 7 "segments" (A0, A1, A2) each
             # Each panel has 28 columns and since all FP2800A are wired in parallel
             # we just need to take care of those 28
-            col = column % 28  # find out where we are on this panel
-            b = int(col / 7)  # find the right "character"
-            a = col % 7 + 1  # find the right "segment" - there is no segment 0
             # Set the address bits
-            self.pins["B0"].value((b >> 0) % 2)
-            self.pins["B1"].value((b >> 1) % 2)
-            self.pins["A0"].value((a >> 0) % 2)
-            self.pins["A1"].value((a >> 1) % 2)
-            self.pins["A2"].value((a >> 2) % 2)
+            self.pins.select("column", column % 28)
             # Store for next run
             self.lastColumn = column
 
     def _select_color(self, color: bool | int) -> None:
         # Switch polarization of the whole grid
         if color != self.lastColor:  # check if the color actually changed, if not do nothing
-            self.pins["RowEN"].on()  # disable row drivers
-            self.pins["RowSEL"].value(1 - color)  # enable high or low row driver
-            self.pins["DATA"].value(color)  # set data bit on column drivers
-            self.pins["RowEN"].off()  # enable row drivers
+            self.pins.on("RowEN")  # disable row drivers
+            # enable high or low row driver and set data bit on column drivers
+            self.pins.output({"RowSEL": 1 - color, "DATA": color})
+            self.pins.off("RowEN")  # enable row drivers
             # Store for next run
             self.lastColor = color
 
-    def _pulse(self, panel: int) -> None:
-        # pulse ENABLE pin of <panel> for <pulsetime> µs
-        (self.pins["EN0"], self.pins["EN1"], self.pins["EN2"], self.pins["EN3"])[panel].on()
-        # time.sleep(self.pulsetime / 1000000)
-        # replace sleep with a timestamp controlled loop since that is way more accurate
-        timestamp = time.time_ns() + self.pulsetime * 1000
-        while timestamp > time.time_ns():
-            pass
-        (self.pins["EN0"], self.pins["EN1"], self.pins["EN2"], self.pins["EN3"])[panel].off()
+    def _pulse(self, panels: list) -> None:
+        # pulse ENABLE pins of all <panels> at once for <pulsetime> µs
+        enable = ("EN0", "EN1", "EN2", "EN3")
+        self.pins.pulse([enable[panel] for panel in panels], self.pulsetime)
 
     def _init_pins(self) -> None:
         # Initialize all needed GPIO pins
-        # Row drivers (74HTC238)
-        self.pins["RowA0"] = GPIO.Pin(19, GPIO.Pin.OUT)
-        self.pins["RowA1"] = GPIO.Pin(16, GPIO.Pin.OUT)
-        self.pins["RowA2"] = GPIO.Pin(26, GPIO.Pin.OUT)
-        self.pins["RowSEL"] = GPIO.Pin(21, GPIO.Pin.OUT)
-        self.pins["RowEN"] = GPIO.Pin(20, GPIO.Pin.OUT, value=1)  # active low
-        # Column drivers (FP2800)
-        self.pins["A0"] = GPIO.Pin(13, GPIO.Pin.OUT)
-        self.pins["A1"] = GPIO.Pin(12, GPIO.Pin.OUT)
-        self.pins["A2"] = GPIO.Pin(6, GPIO.Pin.OUT)
-        self.pins["B0"] = GPIO.Pin(7, GPIO.Pin.OUT)
-        self.pins["B1"] = GPIO.Pin(8, GPIO.Pin.OUT)
-        self.pins["DATA"] = GPIO.Pin(5, GPIO.Pin.OUT)
-        # Panel select (by chosing the corresponding EN pin)
-        self.pins["EN0"] = GPIO.Pin(10, GPIO.Pin.OUT)
-        self.pins["EN1"] = GPIO.Pin(9, GPIO.Pin.OUT)
-        self.pins["EN2"] = GPIO.Pin(25, GPIO.Pin.OUT)
-        self.pins["EN3"] = GPIO.Pin(23, GPIO.Pin.OUT)
-        self.pins["VsEN"] = GPIO.Pin(24, GPIO.Pin.OUT)
-
+        for name, gpio in PINOUT.items():
+            self.pins.add(name, gpio, value=1 if name == "RowEN" else 0)  # RowEN is active low
+        # Precompute the address lines for every row and column
+        self.pins.add_group("row", ["RowA0", "RowA1", "RowA2"], list(range(8)))
+        # FP2800 is subdivided into 4 "characters" (B0, B1) with 7 "segments" (A0, A1, A2) each
+        self.pins.add_group("column", ["A0", "A1", "A2", "B0", "B1"], [column_code(col) for col in range(28)])
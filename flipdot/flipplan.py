@@ -0,0 +1,118 @@
+"""
+Collects the pixels that need to be flipped for one frame and orders them so that as few GPIO pins as possible
+need to change between two pulses.
+"""
+
+# GPIO writes needed to change the color and to pulse one panel
+# the address lines are only written if their level changes, so they cost one write per changed bit
+COLUMN_WRITES = 5  # A0, A1, A2, B0, B1 - all of them if the current address is unknown
+ROW_WRITES = 3  # RowA0, RowA1, RowA2 - all of them if the current address is unknown
+COLOR_WRITES = 4  # RowEN off, RowSEL, DATA, RowEN on
+PULSE_WRITES = 2  # EN on and off
+
+
+def column_code(column: int) -> int:
+    # returns the address bits (B1 B0 A2 A1 A0) the FP2800A needs for <column> of a panel
+    return (column // 7) << 3 | (column % 7 + 1)
+
+
+def gray_rank(value: int) -> int:
+    # returns the position of <value> in the gray code sequence - neighbours differ in only one bit
+    rank = value
+    value >>= 1
+    while value:
+        rank ^= value
+        value >>= 1
+    return rank
+
+
+class FlipPlan:
+    def __init__(self, parallel_panels: int = 1):
+        """
+        :param parallel_panels:
+        Maximum number of panels that can be flipped with the same pulse
+        """
+        self.parallel_panels = parallel_panels
+        self._groups = {}  # (column, row, color) -> list of panels
+        self.steps = []  # compiled list of (column, row, color, panels)
+        self.writes = 0  # estimated number of GPIO writes for all steps
+
+    def add(self, panel: int, column: int, row: int, color: bool | int) -> None:
+        """
+        Add a pixel to the plan
+        :param panel:
+        Panel of the pixel
+        :param column:
+        Column on the panel
+        :param row:
+        Row as it is wired
+        :param color:
+        new color of the pixel
+        """
+        self._groups.setdefault((column, row, int(color)), []).append(panel)
+
+    def compile(self, column: int = -1, row: int = -1, color: int = -1) -> list:
+        """
+        Order all added pixels to minimize pin changes: first all pixels of the current color, then the others.
+        Within a color the columns are visited in gray code order of their address bits and the rows in gray code
+        order, reversed in every other column, so consecutive steps differ in as few address bits as possible
+        :param column:
+        Column address currently set on the drivers
+        :param row:
+        Row address currently set on the drivers
+        :param color:
+        Color currently set on the drivers
+        :return:
+        List of (column, row, color, panels) steps
+        """
+        colors = [1, 0] if color != 0 else [0, 1]
+        self.steps = []
+        for col_color in colors:
+            columns = {}
+            for (address, pixrow, pixcolor), panels in self._groups.items():
+                if pixcolor == col_color:
+                    columns.setdefault(address, []).append((pixrow, panels))
+            ordered = sorted(columns, key=lambda a: gray_rank(column_code(a)))
+            for i, address in enumerate(ordered):
+                rows = sorted(columns[address], key=lambda r: gray_rank(r[0]), reverse=i % 2 == 1)
+                for pixrow, panels in rows:
+                    panels = sorted(panels)
+                    for start in range(0, len(panels), self.parallel_panels):
+                        self.steps.append((address, pixrow, col_color, panels[start:start + self.parallel_panels]))
+        self.writes = self._count_writes(column, row, color)
+        return self.steps
+
+    def _count_writes(self, column: int, row: int, color: int) -> int:
+        # count the GPIO writes the driver needs to execute all steps starting from the given state
+        writes = 0
+        for address, pixrow, pixcolor, panels in self.steps:
+            if address != column:
+                if column < 0:
+                    writes += COLUMN_WRITES
+                else:
+                    writes += (column_code(address) ^ column_code(column)).bit_count()
+                column = address
+            if pixrow != row:
+                if row < 0:
+                    writes += ROW_WRITES
+                else:
+                    writes += (pixrow ^ row).bit_count()
+                row = pixrow
+            if pixcolor != color:
+                writes += COLOR_WRITES
+                color = pixcolor
+            writes += PULSE_WRITES * len(panels)
+        return writes
+
+    @property
+    def pulses(self) -> int:
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __repr__(self) -> str:
+        return f"<FlipPlan with {self.pulses} pulses and {self.writes} GPIO writes>"
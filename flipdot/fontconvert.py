@@ -0,0 +1,197 @@
+"""
+Read and write the binary font format used by flipdot.fonts and import BDF and PSF bitmap fonts into it.
+
+    python -m flipdot.fontconvert font.bdf flipdot/fontdata/name.fdf
+    python -m flipdot.fontconvert --padding 1 --mono font.psf flipdot/fontdata/name.fdf
+
+File layout (all numbers little endian):
+    header  "FDF1", width (u8), height (u8), padding (u8), mono (u8), number of glyphs (u16), reserved (u16)
+    index   one entry per glyph, sorted by codepoint: codepoint (u32), offset into the data (u32), width (u32)
+    data    the glyph columns of all glyphs, one byte per column with the LSB being the top pixel
+"""
+import argparse
+import struct
+
+from .fonts import ENTRY, HEADER, MAGIC
+
+
+def write_fdf(filename: str, glyphs: dict, width: int, height: int, padding: int = 1, mono: bool = False) -> None:
+    """
+    Write a font file
+    :param filename:
+    File to write
+    :param glyphs:
+    Character -> bytes with one byte per column
+    :param width:
+    Width of the widest glyph, used for monospaced rendering
+    :param height:
+    Height of the glyphs in pixels, max. 8
+    :param padding:
+    Empty columns between two glyphs
+    :param mono:
+    Render monospaced by default
+    """
+    if height > 8:
+        raise ValueError("Glyphs can be at most 8 pixels high")
+    index = b""
+    data = b""
+    for char in sorted(glyphs, key=ord):
+        glyph = bytes(glyphs[char])
+        index += ENTRY.pack(ord(char), len(data), len(glyph))
+        data += glyph
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, height, padding, int(mono), len(glyphs), 0))
+        f.write(index)
+        f.write(data)
+
+
+def _columns(rows: list, width: int) -> bytes:
+    # turn a list of rows (ints with the leftmost pixel in the MSB of <width> bits) into column bytes
+    columns = bytearray(width)
+    for y, row in enumerate(rows):
+        for x in range(width):
+            if row >> (width - 1 - x) & 1:
+                columns[x] |= 1 << y
+    return bytes(columns)
+
+
+def _trim(columns: bytes, advance: int) -> bytes:
+    # remove empty columns left and right so the glyph can be used for variable width
+    start = 0
+    end = len(columns)
+    while start < end and columns[start] == 0:
+        start += 1
+    while end > start and columns[end - 1] == 0:
+        end -= 1
+    if start == end:  # empty glyph like space - keep some space
+        return b"\x00" * max(1, advance // 2)
+    return columns[start:end]
+
+
+def read_bdf(filename: str) -> tuple:
+    """
+    Read a BDF font
+    :return:
+    glyphs, width and height like write_fdf() expects them
+    """
+    glyphs = {}
+    ascent = height = None
+    with open(filename, encoding="latin-1") as f:
+        lines = iter(f.read().splitlines())
+    for line in lines:
+        fields = line.split()
+        if not fields:
+            continue
+        if fields[0] == "FONTBOUNDINGBOX":
+            height = int(fields[2])
+            ascent = height + int(fields[4])
+        elif fields[0] == "FONT_ASCENT":
+            ascent = int(fields[1])
+        elif fields[0] == "STARTCHAR":
+            encoding, advance, bbx = -1, 0, (0, 0, 0, 0)
+            rows = []
+            for line in lines:
+                fields = line.split()
+                if not fields:
+                    continue
+                if fields[0] == "ENCODING":
+                    encoding = int(fields[1])
+                elif fields[0] == "DWIDTH":
+                    advance = int(fields[1])
+                elif fields[0] == "BBX":
+                    bbx = tuple(int(field) for field in fields[1:5])
+                elif fields[0] == "BITMAP":
+                    for line in lines:
+                        if line.strip() == "ENDCHAR":
+                            break
+                        rows.append(int(line.strip(), 16))
+                    break
+            if encoding < 0:
+                continue
+            w, h, xoff, yoff = bbx
+            rowbits = (w + 7) // 8 * 8
+            # place the glyph rows relative to the baseline, row 0 is the top of the font
+            top = ascent - (yoff + h)
+            placed = [0] * height
+            for y, row in enumerate(rows):
+                if 0 <= top + y < height:
+                    placed[top + y] = row >> (rowbits - w)
+            glyphs[chr(encoding)] = _trim(_columns(placed, w), advance)
+    if height is None:
+        raise ValueError(f"{filename} is not a BDF font")
+    return glyphs, max(len(glyph) for glyph in glyphs.values()), height
+
+
+def read_psf(filename: str) -> tuple:
+    """
+    Read a PSF (version 1 or 2) console font
+    :return:
+    glyphs, width and height like write_fdf() expects them
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    if data[:2] == b"\x36\x04":
+        mode, charsize = data[2], data[3]
+        count = 512 if mode & 0x01 else 256
+        width, height, rowbytes, offset = 8, charsize, 1, 4
+        has_table = mode & 0x02
+    elif data[:4] == b"\x72\xb5\x4a\x86":
+        _, offset, flags, count, charsize, height, width = struct.unpack("<7I", data[4:32])
+        rowbytes = (width + 7) // 8
+        has_table = flags & 0x01
+    else:
+        raise ValueError(f"{filename} is not a PSF font")
+
+    # map glyph numbers to characters - without a unicode table the glyph number is the codepoint
+    chars = {number: [chr(number)] for number in range(count)}
+    if has_table:
+        chars = {}
+        position = offset + count * charsize
+        for number in range(count):
+            chars[number] = []
+            if data[:2] == b"\x36\x04":
+                sequence = False
+                while True:
+                    value = struct.unpack_from("<H", data, position)[0]
+                    position += 2
+                    if value == 0xFFFF:
+                        break
+                    if value == 0xFFFE:
+                        sequence = True
+                    elif not sequence:
+                        chars[number].append(chr(value))
+            else:
+                end = data.index(b"\xff", position)
+                entry = data[position:end].split(b"\xfe")[0]  # ignore sequences of combining characters
+                chars[number] = list(entry.decode("utf-8", errors="ignore"))
+                position = end + 1
+
+    glyphs = {}
+    for number in range(count):
+        start = offset + number * charsize
+        rows = [int.from_bytes(data[start + y * rowbytes:start + (y + 1) * rowbytes], "big") >> (rowbytes * 8 - width)
+                for y in range(height)]
+        glyph = _trim(_columns(rows, width), width)
+        for char in chars[number]:
+            glyphs.setdefault(char, glyph)
+    return glyphs, max(len(glyph) for glyph in glyphs.values()), height
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert a BDF or PSF bitmap font for the flipdot display")
+    parser.add_argument("source", help="BDF or PSF font file")
+    parser.add_argument("target", help="font file to write, e.g. flipdot/fontdata/name.fdf")
+    parser.add_argument("--padding", type=int, default=1, help="empty columns between two glyphs")
+    parser.add_argument("--mono", action="store_true", help="render monospaced by default")
+    args = parser.parse_args()
+
+    if args.source.lower().endswith(".bdf"):
+        glyphs, width, height = read_bdf(args.source)
+    else:
+        glyphs, width, height = read_psf(args.source)
+    write_fdf(args.target, glyphs, width, height, args.padding, args.mono)
+    print(f"Wrote {len(glyphs)} glyphs ({width} x {height}) to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
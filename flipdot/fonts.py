@@ -6,167 +6,119 @@ Any resemblance of existing fonts is by pure accident and most likely because of
 pixels. Each byte represents one column within the glyph with the LSB being the top pixel.
 All glyphs are left-aligned so they can be used for variable font width or centered for monospaced usage. This
 also saves a few bytes in memory since empty columns don't need to be saved.
+
+The fonts are stored in the binary format described in fontconvert.py in the fontdata folder, which is also
+where BDF and PSF fonts can be imported to.
 """
 
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+
 from . import framebuf
 
-narrow = {
-    "width": 5,
-    "height": 7,
-    "mono": False,
-    "padding": 1,
-    ' ': b'\x00',
-    '!': b'\x5F',
-    '"': b'\x03\x00\x03',
-    '#': b'\x14\x7F\x14\x7F\x14',
-    '$': b'\x46\x49\x7F\x49\x31',
-    '%': b'\x63\x13\x08\x64\x63',
-    '&': b'\x36\x49\x55\x22\x50',
-    '\'': b'\x03',
-    '(': b'\x3E\x41',
-    ')': b'\x41\x3E',
-    '*': b'\x2A\x1C\x7F\x1C\x2A',
-    '+': b'\x08\x1C\x08',
-    ',': b'\x60',
-    '-': b'\x08\x08\x08',
-    '.': b'\x40',
-    '/': b'\x60\x1C\x03',
-    '0': b'\x3E\x41\x41\x3E',
-    '1': b'\x00\x42\x7F\x40',
-    '2': b'\x62\x51\x49\x46',
-    '3': b'\x22\x49\x49\x36',
-    # '4': b'\x08\x0C\x0A\x7F',
-    '4': b'\x0F\x08\x08\x7F',
-    '5': b'\x4F\x49\x49\x31',
-    '6': b'\x3E\x49\x49\x32',
-    '7': b'\x01\x71\x09\x07',
-    '8': b'\x36\x49\x49\x36',
-    '9': b'\x26\x49\x49\x3E',
-    ':': b'\x22',
-    ';': b'\x62',
-    '<': b'\x08\x14\x22',
-    '=': b'\x14\x14\x14',
-    '>': b'\x22\x14\x08',
-    '?': b'\x02\x01\x59\x06',
-    '@': b'\x3C\x42\x5A\x5A\x4C',
-    'A': b'\x7C\x0A\x09\x0A\x7C',
-    'B': b'\x7F\x49\x49\x49\x36',
-    'C': b'\x3E\x41\x41\x41',
-    'D': b'\x7F\x41\x41\x41\x3E',
-    'E': b'\x7F\x49\x49\x41',
-    'F': b'\x7F\x09\x09\x01',
-    'G': b'\x3E\x41\x49\x49\x31',
-    'H': b'\x7F\x08\x08\x7F',
-    'I': b'\x41\x7F\x41',
-    'J': b'\x30\x40\x40\x3F',
-    'K': b'\x7F\x14\x22\x41',
-    'L': b'\x7F\x40\x40\x40',
-    'M': b'\x7F\x02\x04\x02\x7F',
-    'N': b'\x7F\x02\x1C\x20\x7F',
-    'O': b'\x3E\x41\x41\x3E',
-    'P': b'\x7F\x09\x09\x06',
-    'Q': b'\x3E\x41\x51\x21\x5E',
-    'R': b'\x7F\x09\x19\x29\x46',
-    'S': b'\x46\x49\x49\x31',
-    'T': b'\x01\x01\x7F\x01\x01',
-    'U': b'\x3F\x40\x40\x40\x3F',
-    'V': b'\x1F\x20\x40\x20\x1F',
-    'W': b'\x7F\x20\x10\x20\x7F',
-    'X': b'\x63\x14\x08\x14\x63',
-    'Y': b'\x07\x08\x70\x08\x07',
-    'Z': b'\x61\x51\x49\x45\x43',
-    '[': b'\x7F\x41\x41',
-    '\\': b'\x03\x1C\x60',
-    ']': b'\x41\x41\x7F',
-    '^': b'\x04\x02\x01\x02\x04',
-    '_': b'\x40\x40\x40',
-    '`': b'\x01\x02',
-    'a': b'\x34\x54\x78',
-    'b': b'\x7F\x44\x38',
-    'c': b'\x38\x44\x44',
-    'd': b'\x38\x44\x7F',
-    'e': b'\x38\x54\x58',
-    'f': b'\x04\x7E\x05',
-    'g': b'\x48\x54\x3c',
-    'h': b'\x7F\x04\x78',
-    'i': b'\x7A',
-    'j': b'\x20\x40\x3A',
-    'k': b'\x7F\x10\x68',
-    'l': b'\x3F\x40',
-    'm': b'\x7C\x04\x78\x04\x78',
-    'n': b'\x7C\x04\x78',
-    'o': b'\x38\x44\x38',
-    'p': b'\x7c\x14\x08',
-    'q': b'\x08\x14\x7c',
-    'r': b'\x7C\x08\x04',
-    's': b'\x48\x54\x24',
-    't': b'\x3F\x44\x44',
-    'u': b'\x3C\x40\x7C',
-    'v': b'\x3C\x40\x20\x1C',
-    'w': b'\x3C\x40\x20\x40\x3C',
-    'x': b'\x6C\x10\x6C',
-    'y': b'\x4c\x50\x3c',
-    'z': b'\x64\x54\x4C',
-    '{': b'\x08\x36\x41\x41',
-    '|': b'\x7F',
-    '}': b'\x41\x41\x36\x08',
-    '~': b'\x08\x04\x08\x10\x08',
-    '€': b'\x14\x3E\x55\x55\x41',
-    'Ä': b'\x79\x14\x12\x14\x79',
-    'ä': b'\x35\x54\x54\x7D',
-    'Ö': b'\x3D\x42\x42\x42\x3D',
-    'ö': b'\x39\x44\x44\x39',
-    'Ü': b'\x3D\x40\x40\x40\x3D',
-    'ü': b'\x3D\x40\x40\x3D',
-    'ß': b'\x7E\x01\x25\x1A',
-    '°': b'\x02\x05\x02',
-    '™': b'\x01\x0F\x01\x00\x0F\x02\x0F',
-    '♥': b'\x0C\x12\x22\x44\x22\x12\x0C',
-    'α': b'\x38\x44\x44\x3C\x40',
-    'β': b'\x7F\x15\x0A',
-    'γ': b'\x0C\x70\x0C',
-    'δ': b'\x33\x4D\x49\x31',
-    'ε': b'\x28\x54\x44\x28',
-    'ζ': b'\x19\x25\x23\x61',
-    'η': b'\x48\x54\x3c',
-    'θ': b'\x7F\x04\x78',
-    'ι': b'\x3C\x40',
-    'κ': b'\x7C\x10\x6C',
-    'λ': b'',
-    'µ': b'\x7C\x04\x78\x04\x78',
-    'ν': b'\x7C\x04\x78',
-    'ξ': b'',
-    'ο': b'',
-    'π': b'\x04\x7C\x04\x3C\x44',
-    'ρ': b'',
-    'σ': b'',
-    'ς': b'',
-    'ϲ': b'',
-    'τ': b'',
-    'υ': b'',
-    'φ': b'',
-    'χ': b'',
-    'ψ': b'',
-    'ω': b'',
-}
+FONTPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fontdata")
+
+# binary font format, see fontconvert.py
+MAGIC = b"FDF1"
+HEADER = struct.Struct("<4sBBBBHH")
+ENTRY = struct.Struct("<III")
+
+_files = {}  # filename -> FontFile, so all Font objects of one font share the memory mapped file
+
+
+class FontFile:
+    """
+    A memory mapped font file: one contiguous block of glyph data and an index of offsets and widths
+    """
+    def __init__(self, filename: str):
+        with open(filename, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.height, self.padding, mono, count, _ = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a flipdot font file")
+        self.mono = bool(mono)
+        self._glyphstart = HEADER.size + count * ENTRY.size
+        self._index = {}  # char -> (offset, width)
+        for entry in range(count):
+            codepoint, offset, width = ENTRY.unpack_from(self._data, HEADER.size + entry * ENTRY.size)
+            self._index[chr(codepoint)] = (offset, width)
+
+    def glyph(self, char: str) -> bytes:
+        offset, width = self._index[char]
+        start = self._glyphstart + offset
+        return self._data[start:start + width]
+
+    def chars(self):
+        return self._index.keys()
+
+    def __contains__(self, char: str) -> bool:
+        return char in self._index
+
+
+def load(font: str) -> FontFile:
+    """
+    Returns the font file for <font>, which is either the name of a font in the fontdata folder or a path
+    """
+    if os.sep in font or font.endswith(".fdf"):
+        filename = font
+    else:
+        filename = os.path.join(FONTPATH, font + ".fdf")
+    if filename not in _files:
+        _files[filename] = FontFile(filename)
+    return _files[filename]
 
 
 class Font:
-    def __init__(self, font: str, mono: bool = None, padding: int = None):
-        self.fontdef = globals().get(font)
-        self.width = self.fontdef.get("width")
-        self.height = self.fontdef.get("height")
-        self.mono = self.fontdef.get("mono")
-        if mono is not None:
-            self.mono = mono
-        self.padding = self.fontdef.get("padding")
-        if padding is not None:
-            self.padding = padding
+    def __init__(self, font: str, mono: bool = None, padding: int = None, cachesize: int = 64):
+        self.font = font  # the font file is loaded when the font is used for the first time
+        self._file = None
+        self._mono = mono
+        self._padding = padding
+        self.cachesize = cachesize  # number of texts to keep the widths of
+        self._atlases = {}  # (mono, padding) -> {char: glyph bytes incl. padding}
+        self._cache = OrderedDict()  # (text, mono, padding) -> prefix widths, least recently used first
+        self._lock = threading.Lock()  # the cache is used by the display loop and the page pipeline
+
+    @property
+    def fontfile(self) -> FontFile:
+        if self._file is None:
+            self._file = load(self.font)
+        return self._file
+
+    @property
+    def width(self) -> int:
+        return self.fontfile.width
+
+    @property
+    def height(self) -> int:
+        return self.fontfile.height
+
+    @property
+    def mono(self) -> bool:
+        return self.fontfile.mono if self._mono is None else self._mono
+
+    @property
+    def padding(self) -> int:
+        return self.fontfile.padding if self._padding is None else self._padding
+
+    def chars(self):
+        """
+        Returns all characters the font has glyphs for
+        """
+        return self.fontfile.chars()
+
+    def __contains__(self, char: str) -> bool:
+        return char in self.fontfile
 
     def _get_char(self, char: str, mono: bool, padding: int) -> bytes:
-        if char not in self.fontdef.keys():
+        if char not in self.fontfile:
             char = " "
-        charbytes = self.fontdef.get(char)
+        charbytes = self.fontfile.glyph(char)
         width = len(charbytes)
         if mono and width < self.width:
             lpadding = b'\x00' * int((self.width - width) / 2)
@@ -176,15 +128,121 @@ class Font:
         charbytes += b'\x00' * padding
         return charbytes
 
-    def text(self, text: str, mono: bool = None, padding: int = None) -> framebuf.FrameBuffer:
-        # returns a framebuffer that can be blitted onto another
+    def _atlas(self, mono: bool, padding: int) -> dict:
+        # all glyphs of the font, aligned and padded for the given settings - compiled on first use
+        atlas = self._atlases.get((mono, padding))
+        if atlas is None:
+            atlas = {char: self._get_char(char, mono, padding) for char in self.fontfile.chars()}
+            self._atlases[(mono, padding)] = atlas
+        return atlas
+
+    def _settings(self, mono: bool, padding: int) -> tuple:
         if mono is None:
             mono = self.mono
         if padding is None:
             padding = self.padding
-        textbytes = b""
+        return mono, padding
+
+    def render(self, text: str, mono: bool = None, padding: int = None) -> bytes:
+        """
+        Returns the columns of <text> as bytes, one byte per column with the top pixel in the LSB
+        """
+        atlas = self._atlas(*self._settings(mono, padding))
+        space = atlas[" "]
+        return b"".join([atlas.get(char, space) for char in text])
+
+    def text(self, text: str, mono: bool = None, padding: int = None) -> framebuf.FrameBuffer:
+        # returns a framebuffer that can be blitted onto another
+        textbytes = self.render(text, mono, padding)
+        return framebuf.FrameBuffer(len(textbytes), self.height, bytearray(textbytes))
+
+    def draw(self, target: framebuf.FrameBuffer, text: str, pos_x: int = 0, pos_y: int = 0, clip: tuple = None,
+             mono: bool = None, padding: int = None) -> int:
+        """
+        Write <text> straight into the buffer of <target> without rendering it into a temporary buffer first
+        :param target:
+        Framebuffer to draw into
+        :param text:
+        Text to draw
+        :param pos_x:
+        X-Position of the first column of the text, can be negative
+        :param pos_y:
+        Y-Position of the top row of the text, can be negative
+        :param clip:
+        (first, last + 1) columns of target that may be written, defaults to the whole width
+        :return:
+        Width of the text in pixels
+        """
+        atlas = self._atlas(*self._settings(mono, padding))
+        space = atlas[" "]
+        left, right = (0, target.width) if clip is None else (max(clip[0], 0), min(clip[1], target.width))
+        # rows of target covered by the glyphs
+        if pos_y >= 0:
+            mask = (((1 << self.height) - 1) << pos_y) & target._colmask
+        else:
+            mask = (((1 << self.height) - 1) >> -pos_y) & target._colmask
+        x = pos_x
         for char in text:
-            textbytes += self._get_char(char, mono, padding)
-        width = len(textbytes)
+            glyph = atlas.get(char, space)
+            width = len(glyph)
+            if mask and x + width > left and x < right:
+                start, end = max(left - x, 0), min(right - x, width)
+                if target._bufferheight == 1 and pos_y == 0:
+                    # one byte per column - write the glyph bytes directly
+                    buf = target._buf
+                    keep = ~mask & 0xFF
+                    for i in range(start, end):
+                        buf[x + i] = (buf[x + i] & keep) | (glyph[i] & mask)
+                    target._dirty.update(range(x + start, x + end))
+                else:
+                    for i in range(start, end):
+                        column = glyph[i] << pos_y if pos_y >= 0 else glyph[i] >> -pos_y
+                        target._set_column(x + i, (target._get_column(x + i) & ~mask) | (column & mask))
+            x += width
+        return x - pos_x
+
+    def widths(self, text: str, mono: bool = None, padding: int = None) -> tuple:
+        """
+        Returns the prefix widths of <text>: element i is the width of the first i characters
+        """
+        # texts are measured again and again (fit, textwidth, alignment) while the display shows them
+        mono, padding = self._settings(mono, padding)
+        key = (text, mono, padding)
+        with self._lock:
+            widths = self._cache.get(key)
+            if widths is not None:
+                self._cache.move_to_end(key)
+                return widths
+        atlas = self._atlas(mono, padding)
+        space = len(atlas[" "])
+        widths = (0, *accumulate(len(atlas[char]) if char in atlas else space for char in text))
+        with self._lock:
+            self._cache[key] = widths
+            if len(self._cache) > self.cachesize:
+                self._cache.popitem(last=False)  # forget the least recently used text
+        return widths
+
+    def textwidth(self, text: str, mono: bool = None, padding: int = None) -> int:
+        """
+        Returns the width of <text> in pixels
+        """
+        return self.widths(text, mono, padding)[-1]
 
-        return framebuf.FrameBuffer(width, self.height, bytearray(textbytes))
+    def fit(self, text: str, width: int, ellipsis: str = "...", mono: bool = None, padding: int = None) -> str:
+        """
+        Cut off <text> so that it fits into <width> pixels
+        :param text:
+        Text to cut
+        :param width:
+        Available width in pixels
+        :param ellipsis:
+        Appended to the text if it had to be cut
+        :return:
+        The text itself if it fits, otherwise the longest beginning of it that fits together with the ellipsis
+        """
+        widths = self.widths(text, mono, padding)
+        if widths[-1] <= width:
+            return text
+        # binary search for the number of characters that fit together with the ellipsis
+        length = bisect_right(widths, width - self.textwidth(ellipsis, mono, padding)) - 1
+        return text[:max(length, 0)] + ellipsis
@@ -21,6 +21,11 @@ class FrameBuffer:
             self._buf = buffer
         else:
             raise BufferError("Imported buffer must have same size as self")
+        # bitmasks of the valid pixels in one column and in the whole buffer
+        self._colmask = (1 << self.height) - 1
+        self._bufmask = int.from_bytes(self._colmask.to_bytes(self._bufferheight, "little") * self.width, "little")
+        # columns written since the last call of clear_dirty() - a new buffer has never been committed
+        self._dirty = set(range(self.width))
 
     def fill(self, color: [bool, int] = 0) -> None:
         """
@@ -28,7 +33,11 @@ class FrameBuffer:
         :param color:
         Black or White
         """
-        self._buf = bytearray([0x00 if color == 0 else 0xFF] * self.buffersize)
+        if color == 0:
+            self._buf = bytearray(self.buffersize)
+        else:
+            self._buf = bytearray(self._colmask.to_bytes(self._bufferheight, "little") * self.width)
+        self._dirty.update(range(self.width))
 
     def set_pixel(self, pos_x: int, pos_y: int, color: [bool, int]) -> None:
         """
@@ -46,6 +55,7 @@ class FrameBuffer:
         self._buf[byte] &= ~mask
         if color:
             self._buf[byte] |= mask
+        self._dirty.add(pos_x)
 
     def get_pixel(self, pos_x: int, pos_y: int) -> bool:
         """
@@ -100,10 +110,32 @@ class FrameBuffer:
         :param pos_y:
         Y-Position
         """
-        for x in range(buffer.width):
-            for y in range(buffer.height):
-                if pos_x + x in range(self.width) and pos_y + y in range(self.height):
-                    self.set_pixel(pos_x + x, pos_y + y, buffer.get_pixel(x, y))
+        # only the columns that overlap with self need to be touched
+        start = max(0, pos_x)
+        end = min(self.width, pos_x + buffer.width)
+        if start >= end:
+            return
+        # rows of self that will be overwritten by the source buffer
+        if pos_y >= 0:
+            mask = (((1 << buffer.height) - 1) << pos_y) & self._colmask
+        else:
+            mask = (((1 << buffer.height) - 1) >> -pos_y) & self._colmask
+        if mask == 0:
+            return
+        if (pos_y == 0 and mask == self._colmask
+                and self._bufferheight == buffer._bufferheight):
+            # same layout and all rows covered - plain slice assignment
+            bh = self._bufferheight
+            self._buf[start * bh:end * bh] = buffer._buf[(start - pos_x) * bh:(end - pos_x) * bh]
+            self._dirty.update(range(start, end))
+            return
+        for x in range(start, end):
+            column = buffer._get_column(x - pos_x)
+            if pos_y >= 0:
+                column <<= pos_y
+            else:
+                column >>= -pos_y
+            self._set_column(x, (self._get_column(x) & ~mask) | (column & mask))
 
     def scroll(self, offset_x: int, offset_y: int) -> None:
         """
@@ -113,30 +145,34 @@ class FrameBuffer:
         :param offset_y:
         Y-Offset
         """
-        if offset_x < 0:
-            shift_x = 0
-            xend = self.width + offset_x
-            xmove = 1
-        else:
-            shift_x = self.width - 1
-            xend = offset_x - 1
-            xmove = -1
+        if abs(offset_x) >= self.width or abs(offset_y) >= self.height:
+            return
+        if offset_y == 0:
+            # horizontal scroll moves whole columns, the vacated columns keep their content
+            bh = self._bufferheight
+            if offset_x < 0:
+                self._buf[:(self.width + offset_x) * bh] = self._buf[-offset_x * bh:]
+                self._dirty.update(range(0, self.width + offset_x))
+            elif offset_x > 0:
+                self._buf[offset_x * bh:] = self._buf[:(self.width - offset_x) * bh]
+                self._dirty.update(range(offset_x, self.width))
+            return
+        # vertical scroll shifts the bits within each column, the vacated rows keep their content
         if offset_y < 0:
-            y = 0
-            yend = self.height + offset_y
-            ymove = 1
+            moved = (1 << (self.height + offset_y)) - 1
         else:
-            y = self.height - 1
-            yend = offset_y - 1
-            ymove = -1
-        while y != yend:
-            x = shift_x
-            while x != xend:
-                self.set_pixel(
-                    x, y, self.get_pixel(x - offset_x, y - offset_y)
-                )
-                x += xmove
-            y += ymove
+            moved = self._colmask & ~((1 << offset_y) - 1)
+        if offset_x <= 0:
+            columns = range(0, self.width + offset_x)  # read ahead of the columns already written
+        else:
+            columns = range(self.width - 1, offset_x - 1, -1)
+        for x in columns:
+            source = self._get_column(x - offset_x)
+            if offset_y < 0:
+                source >>= -offset_y
+            else:
+                source <<= offset_y
+            self._set_column(x, (self._get_column(x) & ~moved) | (source & moved))
 
     def diff(self, compare_to: 'FrameBuffer') -> int:
         """
@@ -146,13 +182,47 @@ class FrameBuffer:
         :return:
         Number of different pixels
         """
+        if (compare_to.width == self.width and compare_to.height == self.height
+                and compare_to._bufferheight == self._bufferheight):
+            # compare the whole buffer as one big integer
+            mine = int.from_bytes(self._buf, "little")
+            other = int.from_bytes(compare_to._buf, "little")
+            return ((mine ^ other) & self._bufmask).bit_count()
         diffpixels = 0
         for x in range(self.width):
-            for y in range(self.height):
-                if self.get_pixel(x, y) != compare_to.get_pixel(x, y):
-                    diffpixels += 1
+            diffpixels += ((self._get_column(x) ^ compare_to._get_column(x)) & self._colmask).bit_count()
         return diffpixels
 
+    def dirty_columns(self) -> list:
+        """
+        Returns the columns that were written since the last call of clear_dirty()
+        :return:
+        Sorted list of column indices
+        """
+        return sorted(self._dirty)
+
+    def clear_dirty(self) -> None:
+        """
+        Mark all columns as committed, e.g. after they were written to the display
+        """
+        self._dirty.clear()
+
+    def _get_column(self, pos_x: int) -> int:
+        # returns all pixels of one column as an integer with the top pixel in the LSB
+        if self._bufferheight == 1:
+            return self._buf[pos_x]
+        start = pos_x * self._bufferheight
+        return int.from_bytes(self._buf[start:start + self._bufferheight], "little")
+
+    def _set_column(self, pos_x: int, column: int) -> None:
+        # writes all pixels of one column from an integer with the top pixel in the LSB
+        self._dirty.add(pos_x)
+        if self._bufferheight == 1:
+            self._buf[pos_x] = column & 0xFF
+            return
+        start = pos_x * self._bufferheight
+        self._buf[start:start + self._bufferheight] = (column & self._colmask).to_bytes(self._bufferheight, "little")
+
     def __str__(self) -> str:
         # return human readable version of the whole buffer
         text = ""
@@ -0,0 +1,95 @@
+"""
+Modes decide what the display shows. They are registered on the display under a name and FlipDot.loop() calls
+the active one, so new screens are added by registering a mode instead of changing the loop.
+"""
+import time
+
+
+class Mode:
+    """
+    Base class of all modes
+    """
+    def start(self, display) -> None:
+        """
+        Called when the mode becomes active, before the first update() - e.g. to start fetching its data
+        """
+
+    def stop(self, display) -> None:
+        """
+        Called when another mode becomes active
+        """
+
+    def update(self, display) -> float | None:
+        """
+        Update the display
+        :return:
+        Time (as returned by time.time()) when the mode needs to update the display again,
+        None if it only needs to update after a change
+        """
+        return None
+
+
+class ClockMode(Mode):
+    """
+    A simple clock with seconds
+    """
+    def update(self, display) -> float | None:
+        display.clock()
+        return int(time.time()) + 1  # next second
+
+
+class DayclockMode(Mode):
+    """
+    Date and time
+    """
+    def __init__(self, seconds: bool = False) -> None:
+        """
+        :param seconds:
+        Make the dots between hours and minutes blink
+        """
+        self.seconds = seconds
+
+    def update(self, display) -> float | None:
+        display.dayclock(seconds=self.seconds)
+        if self.seconds:
+            return (int(time.time() * 2) + 1) / 2  # next half second
+        return (int(time.time()) // 60 + 1) * 60  # next minute
+
+
+class AnimationMode(Mode):
+    """
+    Plays the animation uploaded with FlipDot.play_animation()
+    """
+    def start(self, display) -> None:
+        display.animationNext = 0  # play it again when the mode is selected again
+
+    def update(self, display) -> float | None:
+        return display.animate()
+
+
+class MessageMode(Mode):
+    """
+    Shows a text once, running it over the display if it is too long. Used for interrupts of the Scheduler
+    """
+    def __init__(self, text: str, font: str = None, align: str = None, transition: bool = True) -> None:
+        """
+        :param font:
+        Font of the text, the font of the display if None
+        :param align:
+        Alignment of the text, the alignment of the display if None
+        :param transition:
+        Scroll the text in, otherwise it replaces the display contents right away
+        """
+        self.text = text
+        self.font = font
+        self.align = align
+        self.transition = transition
+
+    def start(self, display) -> None:
+        font = self.font or display.font
+        if display.fonts[font].textwidth(self.text) > display.width:
+            display.ticker(self.text, font=font)
+            return
+        display.text(self.text, align=self.align, font=font, show=not self.transition)
+        if self.transition:
+            display.transition_scroll()
@@ -0,0 +1,160 @@
+"""
+Pre-rendered pages for modes that rotate through a list of texts. A background thread renders the next pages and
+their transitions ahead of time, so showing a page only needs the dots to be flipped.
+"""
+import logging
+import threading
+from collections import deque
+
+from .framebuf import FrameBuffer
+
+log = logging.getLogger("pages")
+
+
+class Page:
+    """
+    A rendered page together with the transition to it
+    """
+    def __init__(self, index: int, text: str, seconds: float, buffer: FrameBuffer, previous: bytes,
+                 frames: list) -> None:
+        self.index = index  # position in the list of pages
+        self.text = text
+        self.seconds = seconds  # how long the page stays on the display
+        self.buffer = buffer  # the page itself
+        self.previous = previous  # framebuffer contents the transition starts from
+        self.frames = frames  # transition as list of (FrameBuffer, seconds) for the "animation" effect
+
+
+class PagePipeline:
+    def __init__(self, display, source, depth: int = 3, align: str = None, font: str = None) -> None:
+        """
+        :param display:
+        FlipDot to show the pages on
+        :param source:
+        Function returning the current list of pages as (text, seconds) - called from the display loop and from the
+        background thread
+        :param depth:
+        Number of pages rendered ahead
+        :param align:
+        Alignment of the texts, the alignment of the display if None
+        :param font:
+        Font of the texts, the font of the display if None
+        """
+        self.display = display
+        self.source = source
+        self.depth = depth
+        self.align = align
+        self.font = font
+        self.index = 0  # next page to show
+        self.rendered = 0  # pages rendered in the background
+        self.missed = 0  # pages that had to be shown without a prepared page
+        self.errors = 0  # pages that failed to render in the background
+        self.retry = 5  # seconds to wait after an error, unless the pages are invalidated before
+        self._pages = deque()  # prepared pages, next one first
+        self._lock = threading.Condition()
+        self._generation = 0  # counts up when the prepared pages become invalid
+        self._previous = None  # framebuffer contents after the last page shown
+        self._running = False
+        self._thread = None
+
+    def start(self) -> None:
+        """
+        Start rendering in the background
+        """
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="page-pipeline", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread
+        """
+        if self._thread is not None:
+            with self._lock:
+                self._running = False
+                self._lock.notify_all()
+            self._thread.join()
+            self._thread = None
+
+    def invalidate(self) -> None:
+        """
+        Forget all prepared pages, e.g. because the data they show changed. Can be called from any thread
+        """
+        with self._lock:
+            self._pages.clear()
+            self._generation += 1
+            self._lock.notify_all()
+
+    def show_next(self) -> float:
+        """
+        Show the next page with its transition
+        :return:
+        Seconds the page should stay on the display
+        """
+        display = self.display
+        # the background thread continues after the page is in the framebuffer, it needs it for the next transition
+        with self._lock:
+            pages = self.source()
+            index = self.index % len(pages)
+            text, seconds = pages[index]
+            page = self._pages.popleft() if self._pages else None
+            if page is not None and page.index == index and page.text == text and display._buf == page.previous:
+                display.copy_buffer(page.buffer, 0, 0)
+                display.lastText = text
+                display.commit(effect="animation", frames=page.frames)
+            else:
+                # the page changed or the display shows something else than expected - render it now
+                if page is not None:
+                    self.invalidate()
+                self.missed += 1
+                display.text(text, align=self.align, font=self.font, show=False, cutoff=True)
+                display.transition_scroll()
+            self.index = index + 1
+            self._previous = bytes(display._buf)
+            self._lock.notify_all()
+        return seconds
+
+    def _render(self, index: int, text: str, seconds: float, previous: FrameBuffer) -> Page:
+        display = self.display
+        buffer = display.render(text, align=self.align, font=self.font)
+        display._avoid_dead_pixel(buffer)
+        buffer.clear_dirty()
+        # the transition generator reuses its frame, keep a copy of every step
+        animation = display._transition_scroll(buffer, previous=previous)
+        frames = [(FrameBuffer(display.width, display.height, bytearray(frame._buf)), 0.0)
+                  for frame, _ in animation.timeline()]
+        return Page(index, text, seconds, buffer, bytes(previous._buf), frames)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while self._running and len(self._pages) >= self.depth:
+                    self._lock.wait()
+                if not self._running:
+                    return
+                generation = self._generation
+                if self._pages:
+                    last = self._pages[-1]
+                    index, previous = last.index + 1, last.buffer
+                else:
+                    # the next page starts from the last page shown
+                    index = self.index
+                    previous = FrameBuffer(self.display.width, self.display.height,
+                                           bytearray(self._previous or self.display._buf))
+            try:
+                pages = self.source()
+                index %= len(pages)
+                page = self._render(index, *pages[index], previous)
+            except Exception:
+                # show_next() renders the pages itself meanwhile, the thread tries again after a change or a while
+                self.errors += 1
+                log.exception("Rendering page %d failed", index)
+                with self._lock:
+                    if self._running and generation == self._generation:
+                        self._lock.wait(self.retry)
+                continue
+            with self._lock:
+                if generation == self._generation:
+                    self._pages.append(page)
+                    self.rendered += 1
@@ -0,0 +1,248 @@
+"""
+Decides which mode is active: a playlist of modes with durations and time-of-day rules, preempted by interrupts
+like alerts or messages. Interrupted modes resume where they stopped once the interrupts are over. The scheduler
+builds on FlipDot.loop() and returns when it has to run next, so it never needs to be polled.
+"""
+import time
+from datetime import datetime, timedelta
+
+from .framebuf import FrameBuffer
+from .modes import Mode
+
+DAY = 24 * 60  # minutes
+
+
+def _minutes(value: str | None, default: int) -> int:
+    # "HH:MM" -> minutes after midnight
+    if value is None:
+        return default
+    hours, minutes = str(value).split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > DAY:
+        raise ValueError(f"Invalid time of day {value}")
+    return hours * 60 + minutes
+
+
+class Entry:
+    def __init__(self, mode: str, duration: float = None, start: str = None, end: str = None,
+                 days: list = None) -> None:
+        """
+        One item of a playlist
+        :param mode:
+        Name of a registered mode
+        :param duration:
+        Seconds the mode stays on before the next entry, None to keep it until its time window ends
+        :param start:
+        Time of day "HH:MM" from which the entry is played, midnight if None
+        :param end:
+        Time of day "HH:MM" until which the entry is played, midnight if None. The window may span midnight
+        :param days:
+        Weekdays the entry is played on, 0 being Monday. All days if None
+        """
+        if duration is not None and duration <= 0:
+            raise ValueError("duration must be positive")
+        self.mode = mode
+        self.duration = duration
+        self.start = _minutes(start, 0)
+        self.end = _minutes(end, DAY)
+        self.days = None if days is None else frozenset(int(day) for day in days)
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "Entry":
+        """
+        Returns the entry described by <entry> as in the JSON API, e.g. {"mode": "clock", "duration": 60}
+        """
+        return cls(entry["mode"], entry.get("duration"), entry.get("start"), entry.get("end"), entry.get("days"))
+
+    def as_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "duration": self.duration,
+            "start": f"{self.start // 60:02d}:{self.start % 60:02d}",
+            "end": f"{self.end // 60:02d}:{self.end % 60:02d}",
+            "days": None if self.days is None else sorted(self.days),
+        }
+
+    def active(self, now: datetime) -> bool:
+        """
+        Returns True if the entry may be played at <now>
+        """
+        if self.days is not None and now.weekday() not in self.days:
+            return False
+        minute = now.hour * 60 + now.minute
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def next_change(self, now: datetime) -> float | None:
+        """
+        Returns the time (as returned by time.time()) when active() changes next, None if it never does
+        """
+        current = self.active(now)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        # active() only changes at the start, the end or at midnight, look a week ahead for the weekdays
+        for day in range(8):
+            for minute in sorted({0, self.start % DAY, self.end % DAY}):
+                at = midnight + timedelta(days=day, minutes=minute)
+                if at > now and self.active(at) != current:
+                    return at.timestamp()
+        return None
+
+
+class Interrupt:
+    def __init__(self, name: str, mode: Mode | None, priority: int, until: float) -> None:
+        self.name = name  # display.mode while the interrupt is shown
+        self.mode = mode  # registered under the name while needed, None for a mode that is registered already
+        self.priority = priority
+        self.until = until  # time.time() when the interrupt is over
+        self.created = time.time()
+
+
+class Scheduler:
+    def __init__(self, display, playlist: list = None, default: str = None) -> None:
+        """
+        :param display:
+        FlipDot whose mode is selected
+        :param playlist:
+        List of Entry, played in order. Without a playlist the mode is only changed by interrupts and requests
+        :param default:
+        Mode selected when no entry of the playlist may be played, None to keep the mode
+        """
+        self.display = display
+        self.playlist = list(playlist or [])
+        self.default = default
+        self.index = -1  # current entry of the playlist, -1 for none
+        self.entryEnd = None  # time.time() when the current entry is over, None if only its time window ends it
+        self.windowChange = None  # time.time() when the time windows have to be checked again, None for never
+        self.idle = False  # no entry may be played, the default mode was selected
+        self.interrupts = []  # pending interrupts, the one shown first
+        self._current = None  # interrupt on the display, None while the playlist runs
+        self._resume = None  # (mode, framebuffer, lastText, seconds left of the entry) of the preempted mode
+
+    def set_playlist(self, playlist: list) -> None:
+        """
+        Replace the playlist and start it from the beginning
+        """
+        self.playlist = list(playlist)
+        self.index = -1
+        self.entryEnd = None
+        self.windowChange = None
+        self.idle = False
+
+    def interrupt(self, name: str, mode: Mode = None, priority: int = 1, duration: float = 10) -> None:
+        """
+        Show a mode for <duration> seconds instead of the current one, which continues afterwards. A higher
+        priority preempts a lower one, with the same priority the newest interrupt is shown first.
+        An interrupt with the name of a pending one replaces it. Call from the thread running loop()
+        :param name:
+        Name the mode is shown as
+        :param mode:
+        Mode to show, registered as <name> while the interrupt is pending. None to show the registered mode <name>
+        """
+        if mode is None and name not in self.display.modes:
+            raise KeyError(f"Unknown mode {name}")
+        for old in self.interrupts:
+            if old.name == name:
+                self.interrupts.remove(old)
+                self._unregister(old)
+                break
+        self.interrupts.append(Interrupt(name, mode, priority, time.time() + duration))
+        self.interrupts.sort(key=lambda interrupt: (interrupt.priority, interrupt.created), reverse=True)
+
+    def loop(self, standby: bool = False) -> float | None:
+        """
+        Select the mode and update the display, replaces calling FlipDot.loop() directly
+        Run this when the returned time is reached or when something changed
+        :return:
+        Time (as returned by time.time()) when the scheduler needs to run again, None if only after a change
+        """
+        if standby:
+            # nothing is shown, the schedule continues when the display is turned on again
+            return self.display.loop(standby=True)
+        times = [self._schedule(time.time()), self.display.loop()]
+        if (self.interrupts[0] if self.interrupts else None) is not self._current:
+            return time.time()  # the mode added an interrupt, show it right away
+        times = [at for at in times if at is not None]
+        return min(times) if times else None
+
+    def _schedule(self, now: float) -> float | None:
+        # select the mode for <now>, returns when the selection has to be checked again
+        for interrupt in [interrupt for interrupt in self.interrupts if interrupt.until <= now]:
+            self.interrupts.remove(interrupt)
+            self._unregister(interrupt)
+        if self._current is not None and self.display.mode != self._current.name:
+            # a mode was selected by a request during the interrupt, it wins over all interrupts
+            for interrupt in self.interrupts:
+                self._unregister(interrupt)
+            self.interrupts = []
+            self._resume = None
+            self._current = None
+        top = self.interrupts[0] if self.interrupts else None
+        if top is not self._current:
+            if self._current is None:
+                self._preempt(now)
+            if top is None:
+                self._restore(now)
+            else:
+                if top.mode is not None:
+                    self.display.register_mode(top.name, top.mode)
+                self.display.mode = top.name
+            self._current = top
+        if top is not None:
+            return top.until
+        return self._advance(now)
+
+    def _preempt(self, now: float) -> None:
+        # remember what the playlist showed to resume it after the interrupts
+        remaining = None if self.entryEnd is None else max(0.0, self.entryEnd - now)
+        self._resume = (self.display.mode, bytes(self.display._buf), self.display.lastText, remaining)
+
+    def _restore(self, now: float) -> None:
+        mode, buffer, text, remaining = self._resume
+        self._resume = None
+        self.display.mode = mode
+        # the mode continues on the frame it showed - it only draws when it has something new
+        self.display.copy_buffer(FrameBuffer(self.display.width, self.display.height, bytearray(buffer)), 0, 0)
+        self.display.lastText = text
+        self.display.show()
+        if remaining is not None:
+            self.entryEnd = now + remaining
+
+    def _advance(self, now: float) -> float | None:
+        # play the playlist, a mode selected by a request stays until the current entry is over
+        if self.windowChange is None or now < self.windowChange:
+            # the time windows are the same as on the last check
+            if 0 <= self.index < len(self.playlist) and (self.entryEnd is None or self.entryEnd > now):
+                return self._next_wakeup()
+            if self.idle:
+                return self.windowChange
+        date = datetime.fromtimestamp(now)
+        for step in range(1, len(self.playlist) + 1):
+            index = (self.index + step) % len(self.playlist)
+            entry = self.playlist[index]
+            if entry.active(date):
+                self.index = index
+                self.entryEnd = None if entry.duration is None else now + entry.duration
+                self.windowChange = entry.next_change(date)
+                self.idle = False
+                self.display.mode = entry.mode
+                return self._next_wakeup()
+        self.index = -1
+        self.entryEnd = None
+        if not self.idle:
+            self.idle = True
+            if self.default is not None:
+                self.display.mode = self.default
+        # wait for the first entry to become active
+        changes = [at for at in (entry.next_change(date) for entry in self.playlist) if at is not None]
+        self.windowChange = min(changes) if changes else None
+        return self.windowChange
+
+    def _next_wakeup(self) -> float | None:
+        changes = [at for at in (self.entryEnd, self.windowChange) if at is not None]
+        return min(changes) if changes else None
+
+    def _unregister(self, interrupt: Interrupt) -> None:
+        # remove the mode of an interrupt that is over, unless it was replaced
+        if interrupt.mode is not None and self.display.modes.get(interrupt.name) is interrupt.mode:
+            del self.display.modes[interrupt.name]
@@ -0,0 +1,138 @@
+"""
+Simulated GPIO backend to run the display driver without the hardware, e.g. on a development machine or for
+benchmarks. It decodes the pin writes the same way the FP2800A column drivers and the 74HCT238 row drivers do
+and keeps the resulting dots in a virtual dot matrix.
+"""
+
+from .framebuf import FrameBuffer
+
+
+class SimulatedGPIO:
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, height: int = 7, panels: int = 3, panelwidth: int = 28, pinout: dict = None,
+                 write_ns: int = 0) -> None:
+        """
+        :param height:
+        Height of the panels in pixels
+        :param panels:
+        Number of panels wired to the controller
+        :param panelwidth:
+        Width of each panel in pixels
+        :param pinout:
+        Pin name -> GPIO number, defaults to the pinout of the display driver
+        :param write_ns:
+        Time every call into the GPIO library adds to the virtual clock
+        """
+        if pinout is None:
+            from .flipdot import PINOUT
+            pinout = PINOUT
+        self.pinout = pinout
+        self.names = {gpio: name for name, gpio in pinout.items()}
+        self.panels = panels
+        self.panelwidth = panelwidth
+        self.write_ns = write_ns
+        self.levels = {}  # gpio number -> level
+        # dots as they are wired, not turned for upside-down mounting
+        self.dots = FrameBuffer(panels * panelwidth, height)
+        # statistics
+        self.clock_ns = 0  # virtual time spent driving the display
+        self.writes = 0  # number of lines written
+        self.calls = 0  # number of calls into the library
+        self.pulses = 0  # number of enable pulses
+        self.flips = 0  # number of dots driven
+        self.errors = 0  # pulses with an invalid pin state, e.g. unpowered or wrong polarity
+
+    def setmode(self, mode: int) -> None:
+        pass
+
+    def setwarnings(self, warnings: bool) -> None:
+        pass
+
+    def setup(self, channel: int, direction: int, initial: int = 0) -> None:
+        self.levels[channel] = initial
+
+    def input(self, channel: int) -> int:
+        return self.levels.get(channel, 0)
+
+    def output(self, channel, value) -> None:
+        # accepts a single channel or lists of channels and values like RPi.GPIO
+        if isinstance(channel, (list, tuple)):
+            if not isinstance(value, (list, tuple)):
+                value = [value] * len(channel)
+            changes = list(zip(channel, value))
+        else:
+            changes = [(channel, value)]
+        self.calls += 1
+        self.clock_ns += self.write_ns
+        rising = []
+        for channel, value in changes:
+            value = int(bool(value))
+            if value and not self.levels.get(channel, 0):
+                rising.append(self.names.get(channel))
+            self.levels[channel] = value
+            self.writes += 1
+        # the dots are driven while EN of a panel is high, so decode on the rising edge
+        panels = [int(name[2:]) for name in rising if name is not None and name[:2] == "EN" and name[2:].isdigit()]
+        if panels:
+            self._drive(panels)
+
+    def pulse(self, channels: list, microseconds: int) -> None:
+        # timed pulse like the pigpio backend - account its length on the virtual clock instead of waiting
+        self.output(list(channels), 1)
+        self.clock_ns += microseconds * 1000
+        self.output(list(channels), 0)
+
+    def cleanup(self) -> None:
+        self.levels = {channel: 0 for channel in self.levels}
+
+    def reset_stats(self) -> None:
+        """
+        Reset all statistics to zero
+        """
+        self.clock_ns = self.writes = self.calls = self.pulses = self.flips = self.errors = 0
+
+    def frame(self, upside_down: bool = True) -> FrameBuffer:
+        """
+        Returns the dots as they are seen by the viewer
+        :param upside_down:
+        The display is mounted upside-down (like the default of the driver)
+        """
+        buffer = FrameBuffer(self.dots.width, self.dots.height)
+        for x in range(self.dots.width):
+            for y in range(self.dots.height):
+                if upside_down:
+                    buffer.set_pixel(x, y, self.dots.get_pixel(self.dots.width - 1 - x, self.dots.height - 1 - y))
+                else:
+                    buffer.set_pixel(x, y, self.dots.get_pixel(x, y))
+        buffer.clear_dirty()
+        return buffer
+
+    def _pin(self, name: str) -> int:
+        return self.levels.get(self.pinout[name], 0)
+
+    def _drive(self, panels: list) -> None:
+        self.pulses += 1
+        # Vs has to be on and the row drivers enabled (RowEN is active low)
+        if not self._pin("VsEN") or self._pin("RowEN"):
+            self.errors += 1
+            return
+        # FP2800A: B0, B1 select the "character", A0..A2 the "segment" - there is no segment 0
+        segment = self._pin("A0") | self._pin("A1") << 1 | self._pin("A2") << 2
+        character = self._pin("B0") | self._pin("B1") << 1
+        # 74HCT238: RowA0..RowA2 select the row output
+        row = self._pin("RowA0") | self._pin("RowA1") << 1 | self._pin("RowA2") << 2
+        color = self._pin("DATA")
+        # the row has to be driven with the opposite polarity of the column, otherwise no current flows
+        if segment == 0 or row >= self.dots.height or self._pin("RowSEL") == color:
+            self.errors += 1
+            return
+        column = character * 7 + segment - 1
+        for panel in panels:
+            if panel < self.panels:
+                self.dots.set_pixel(panel * self.panelwidth + column, row, color)
+                self.flips += 1
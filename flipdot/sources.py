@@ -0,0 +1,291 @@
+"""
+Data sources for modes that show remote data. A source fetches its data on the asyncio event loop through one
+shared HTTP client and publishes the result as one object, which the modes render from. The display loop never
+waits for the network.
+"""
+import asyncio
+import json
+import logging
+import ssl
+import time
+import urllib.parse
+from abc import ABC, abstractmethod
+
+log = logging.getLogger("sources")
+
+
+class HTTPError(OSError):
+    def __init__(self, status: int, url: str) -> None:
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+
+
+class HTTPClient:
+    def __init__(self, timeout: float = 10, maxidle: int = 2, useragent: str = "FlipDot") -> None:
+        """
+        Minimal asyncio HTTP/1.1 client, keeping connections open for the next request to the same server
+        :param timeout:
+        Seconds a request may take, including connecting
+        :param maxidle:
+        Number of idle connections kept per server
+        :param useragent:
+        User-Agent header of all requests
+        """
+        self.timeout = timeout
+        self.maxidle = maxidle
+        self.useragent = useragent
+        self.requests = 0  # number of requests sent
+        self.connections = 0  # number of connections opened
+        self._idle = {}  # (scheme, host, port) -> list of (reader, writer)
+        self._ssl = None  # default SSL context, created for the first https request
+
+    async def get(self, url: str, headers: dict = None) -> tuple:
+        """
+        Request <url>
+        :return:
+        status, response headers with lowercase names and body
+        """
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        target = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        request = (f"GET {target} HTTP/1.1\r\n"
+                   f"Host: {parts.netloc}\r\n"
+                   f"User-Agent: {self.useragent}\r\n"
+                   f"Accept-Encoding: identity\r\n")
+        for name, value in (headers or {}).items():
+            request += f"{name}: {value}\r\n"
+        request = (request + "\r\n").encode()
+
+        for attempt in range(2):
+            reader, writer, reused = await self._connect(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers, body, keepalive = await asyncio.wait_for(self._response(reader), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                writer.close()
+                if reused and attempt == 0:
+                    continue  # the server closed the idle connection in the meantime, try a new one
+                if isinstance(e, asyncio.IncompleteReadError):
+                    raise ConnectionError(f"Response from {url} was cut off") from e
+                raise
+            except asyncio.LimitOverrunError as e:
+                writer.close()
+                raise ConnectionError(f"Response from {url} has a line that is too long") from e
+            except BaseException:
+                writer.close()
+                raise
+            self.requests += 1
+            if keepalive:
+                self._release(key, reader, writer)
+            else:
+                writer.close()
+            return status, headers, body
+
+    async def get_json(self, url: str) -> dict:
+        """
+        Request <url> and parse the JSON response, raises HTTPError for error responses
+        """
+        status, headers, body = await self.get(url, {"Accept": "application/json"})
+        if status >= 400:
+            raise HTTPError(status, url)
+        return json.loads(body)
+
+    async def close(self) -> None:
+        """
+        Close all idle connections
+        """
+        for connections in self._idle.values():
+            for reader, writer in connections:
+                writer.close()
+        self._idle = {}
+
+    async def _connect(self, key: tuple) -> tuple:
+        # returns an idle connection to the server or opens a new one
+        connections = self._idle.get(key, [])
+        while connections:
+            reader, writer = connections.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        context = None
+        if scheme == "https":
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            context = self._ssl
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=context), self.timeout)
+        self.connections += 1
+        return reader, writer, False
+
+    def _release(self, key: tuple, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connections = self._idle.setdefault(key, [])
+        if len(connections) < self.maxidle:
+            connections.append((reader, writer))
+        else:
+            writer.close()
+
+    @staticmethod
+    async def _response(reader: asyncio.StreamReader) -> tuple:
+        # read one response, returns status, headers, body and if the connection can be used again
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        version, status = head[0].split(" ")[:2]
+        headers = {}
+        for line in head[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        keepalive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        status = int(status)
+        if status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif "chunked" in headers.get("transfer-encoding", "").lower():
+            body = b""
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readuntil(b"\r\n")  # no trailers expected, just the final line
+                    break
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()  # the response ends with the connection
+            keepalive = False
+        return status, headers, body, keepalive
+
+
+class Source(ABC):
+    def __init__(self, interval: float = 60, retry: float = 5, maxretry: float = 300, maxage: float = None) -> None:
+        """
+        Base class of all data sources, subclasses implement fetch()
+        :param interval:
+        Seconds between two fetches
+        :param retry:
+        Seconds to wait after a failed fetch, doubled with every further failure
+        :param maxretry:
+        Longest time to wait after failed fetches
+        :param maxage:
+        Seconds after which the data is too old to be shown, None to show the last data forever
+        """
+        self.interval = interval
+        self.retry = retry
+        self.maxretry = maxretry
+        self.maxage = maxage
+        self.empty = None  # data before the first successful fetch or when it is too old
+        self.data = None  # last good data, only ever replaced as a whole
+        self.fetched = 0.0  # time.time() of the last successful fetch
+        self.errors = 0  # failed fetches in a row
+        self.on_update = None  # called after the data changed
+
+    @abstractmethod
+    async def fetch(self, client: HTTPClient):
+        """
+        Fetch and return new data, raise OSError or ValueError if that fails. The data must not be changed later
+        """
+
+    def current(self):
+        """
+        Returns the last good data, or the empty data if there is none or it is older than maxage
+        """
+        if self.data is None or (self.maxage is not None and time.time() - self.fetched > self.maxage):
+            return self.empty
+        return self.data
+
+    async def refresh(self, client: HTTPClient) -> bool:
+        """
+        Fetch new data now and publish it if that worked
+        :return:
+        True if the data was updated
+        """
+        try:
+            data = await self.fetch(client)
+        except (OSError, ValueError, KeyError, AttributeError, TypeError) as e:
+            self.errors += 1
+            log.warning("%s: fetching failed (%d in a row): %r", type(self).__name__, self.errors, e)
+            return False
+        changed = data != self.data
+        self.data = data
+        self.fetched = time.time()
+        self.errors = 0
+        if changed and self.on_update is not None:
+            self.on_update()
+        return True
+
+    def next_wait(self, success: bool) -> float:
+        # seconds until the next fetch
+        if success:
+            return self.interval
+        return min(self.retry * 2 ** (self.errors - 1), self.maxretry)
+
+
+class Poller:
+    def __init__(self, client: HTTPClient = None) -> None:
+        """
+        Fetches the data of all added sources on the asyncio event loop, each at its own interval
+        :param client:
+        HTTP client shared by all sources
+        """
+        self.client = client or HTTPClient()
+        self.sources = []
+        self._tasks = {}  # source -> task fetching it
+        self._running = False
+
+    def add(self, source: Source) -> None:
+        """
+        Start fetching the data of <source>. Call from the event loop thread
+        """
+        if source in self.sources:
+            return
+        self.sources.append(source)
+        if self._running:
+            self._tasks[source] = asyncio.get_running_loop().create_task(self._poll(source))
+
+    def remove(self, source: Source) -> None:
+        """
+        Stop fetching the data of <source>, its last data is kept. Call from the event loop thread
+        """
+        if source not in self.sources:
+            return
+        self.sources.remove(source)
+        task = self._tasks.pop(source, None)
+        if task is not None:
+            task.cancel()
+
+    async def start(self) -> None:
+        """
+        Start fetching on the running event loop
+        """
+        self._running = True
+        loop = asyncio.get_running_loop()
+        self._tasks = {source: loop.create_task(self._poll(source)) for source in self.sources}
+
+    async def stop(self) -> None:
+        """
+        Stop fetching and close the connections
+        """
+        self._running = False
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
+        await self.client.close()
+
+    async def _poll(self, source: Source) -> None:
+        # a source that is added again continues its interval instead of fetching right away
+        wait = source.fetched + source.interval - time.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        while True:
+            try:
+                success = await source.refresh(self.client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # a bug in one source must not stop its updates for good, retry like after a failed fetch
+                source.errors += 1
+                success = False
+                log.exception("%s: unexpected error while fetching", type(source).__name__)
+            await asyncio.sleep(source.next_wait(success))
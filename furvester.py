@@ -1,36 +1,128 @@
+import asyncio
+import os
 import time
-from datetime import timedelta, datetime
+from datetime import datetime
 from random import randint
-from asciiconverter import converter
+from types import MappingProxyType
+from typing import NamedTuple
 
-from flipdot.framebuf import FrameBuffer
+from asciiconverter import convert_all
+
+from flipdot.fonts import Font
+from flipdot.modes import MessageMode, Mode
+from flipdot.pages import PagePipeline
+from flipdot.scheduler import Scheduler
+from flipdot.sources import HTTPClient, Poller, Source
 import flipdot
-from requests_cache import CachedSession
 
-URL_LEADS = "https://convention.api.furvester.org/game/leaderboard"
-URL_STATS = "https://convention.api.furvester.org/game/bloop-statistics"
+# the API can be replaced by a local server for testing, e.g. FURVESTER_API=http://localhost:8000
+API = os.environ.get("FURVESTER_API", "https://convention.api.furvester.org")
+URL_LEADS = API + "/game/leaderboard"
+URL_STATS = API + "/game/bloop-statistics"
 ACHIEVEMENT = "2764518326123855"
 
 NEW_YEAR = datetime(2024,1,1,0,0,0)
 
+
+class Snapshot(NamedTuple):
+    """
+    Everything the screens show, fetched at the same time. Never changed, the source replaces it as a whole
+    """
+    leaders: tuple = ()  # (name, points) of the leading players, best first
+    stats: MappingProxyType = MappingProxyType({})  # bloop statistics
+
+
+class FurvesterSource(Source):
+    def __init__(self, url_leads: str = URL_LEADS, url_stats: str = URL_STATS, limit: int = 3,
+                 font: Font = None, **settings) -> None:
+        """
+        Leaderboard and statistics of the game
+        :param url_leads:
+        URL of the leaderboard
+        :param url_stats:
+        URL of the bloop statistics
+        :param limit:
+        Number of leading players to fetch
+        :param font:
+        Font the names are converted for
+        :param settings:
+        interval, retry, maxretry and maxage, see Source
+        """
+        super().__init__(**settings)
+        self.url_leads = url_leads
+        self.url_stats = url_stats
+        self.limit = limit
+        self.font = font
+        self.empty = Snapshot()
+
+    async def fetch(self, client: HTTPClient) -> Snapshot:
+        leads, stats = await asyncio.gather(client.get_json(f"{self.url_leads}?limit={self.limit}"),
+                                            client.get_json(self.url_stats))
+        entries = (leads.get("data") or [])[:self.limit]
+        # convert all nicknames with one translation table, players without an identity are anonymous
+        names = convert_all([(entry.get("identity") or {}).get("nickname") or "Anonymous" for entry in entries],
+                            self.font)
+        leaders = tuple((name, entry.get("points")) for name, entry in zip(names, entries))
+        return Snapshot(leaders, MappingProxyType(dict(stats.get("data") or {})))
+
+
+class FurvesterMode(Mode):
+    def __init__(self, poller: Poller, source: FurvesterSource = None, scheduler: Scheduler = None) -> None:
+        """
+        Shows the leaderboard and statistics of the game. The data is fetched by <poller> once the mode is used
+        :param scheduler:
+        Shows the achievement code from time to time as an interrupt, no achievement code if None
+        """
+        self.poller = poller
+        self.source = source
+        self.scheduler = scheduler
+        self.screen = None
+
+    def start(self, display: "flipdot.FlipDot") -> None:
+        if self.screen is None:
+            if self.source is None:
+                self.source = FurvesterSource(font=display.fonts[display.font])
+            self.screen = Furvester(display, self.source)
+            if self.scheduler is not None:
+                self.screen.on_achievement = self.achievement
+        else:
+            self.screen.pipeline.start()
+        self.poller.add(self.source)
+
+    def stop(self, display: "flipdot.FlipDot") -> None:
+        # neither fetch nor render pages while other modes use the display
+        self.poller.remove(self.source)
+        self.screen.pipeline.stop()
+
+    def update(self, display: "flipdot.FlipDot") -> float | None:
+        self.screen.screen()
+        return self.screen.pageNextTime
+
+    def achievement(self) -> None:
+        # flash the code over the current page, the page continues afterwards
+        self.scheduler.interrupt("achievement", MessageMode(ACHIEVEMENT, transition=False), priority=0,
+                                 duration=self.screen.achievementTime)
+
+
 class Furvester:
-    def __init__(self, display: "flipdot.FlipDot"):
-        self.session = CachedSession(
-            cache_control=True,
-            expire_after=timedelta(seconds=60),
-            backend="memory",
-        )
+    def __init__(self, display: "flipdot.FlipDot", source: FurvesterSource):
         self.display = display
+        self.source = source
+        # render the next pages in the background, again whenever new data arrives
+        self.pipeline = PagePipeline(display, lambda: self.get_pages(self.source.current()))
+        self.source.on_update = self.pipeline.invalidate
+        self.pipeline.start()
         self.pageWaitTime = 5
         self.pageNextTime = 0
-        self.page = 0
         self.achievementtimermin = 50
         self.achievementtimermax = 100
         self.achievementtimer = randint(self.achievementtimermin, self.achievementtimermax)
+        self.achievementTime = 0.5  # seconds the achievement code is visible
+        self.on_achievement = None  # called when the achievement code is due
 
-        # calculate statistics
+        # calculate statistics - the page durations don't depend on the data
         seconds = 0.0
-        pages = self.get_pages()
+        pages = self.get_pages(Snapshot())
         for page in pages:
             seconds += page[1]
         ppm = 60 / seconds * len(pages)
@@ -39,71 +131,51 @@ class Furvester:
         print(f"The achievement-code will be visible every {self.achievementtimermin/ppm*60:0.0f} "
               f"to {self.achievementtimermax/ppm*60:0.0f} seconds.")
 
-    def get_leaders(self, place: int = 0, limit: int = 3) -> tuple[str, int]:
-        response = self.session.get(URL_LEADS + "?limit=" + str(limit))
-        result = response.json()
-        data = result.get("data")
-        if data:
-            try:
-                entry = data[place]
-            except IndexError:
-                entry = None
-            if entry is not None:
-                identity = entry.get("identity")
-                if identity:
-                    name = converter(identity.get("nickname"))
-                else:
-                    name = "Anonymous"
-                points = entry.get("points")
-                return name, points
+    @staticmethod
+    def get_leaders(snapshot: Snapshot, place: int = 0) -> tuple[str, int]:
+        if place < len(snapshot.leaders):
+            return snapshot.leaders[place]
         return "N/A", 0
 
-    def get_stats(self, stat: str) -> int:
-        response = self.session.get(URL_STATS)
-        result = response.json()
-        data = result.get("data")
-        if data:
-            return data.get(stat)
-        else:
-            return 0
+    @staticmethod
+    def get_stats(snapshot: Snapshot, stat: str) -> int:
+        return snapshot.stats.get(stat, 0)
 
     def screen(self):
         if self.pageNextTime < time.time():
-            pages = self.get_pages()
             self.achievementtimer -= 1
             if self.achievementtimer == 0:
                 self.achievementtimer = randint(self.achievementtimermin, self.achievementtimermax)
-                self.achievementcode()
-            text, seconds = pages[self.page]
-            self.display.text(text, show=False, cutoff=True)
-            self.display.transition_scroll()
+                if self.on_achievement is not None:
+                    self.on_achievement()
+            seconds = self.pipeline.show_next()
             self.pageNextTime = time.time() + seconds
-            self.page += 1
-            if self.page >= len(pages):
-                self.page = 0
 
-    def get_pages(self):
+    def get_pages(self, snapshot: Snapshot):
+        first = self.get_leaders(snapshot, 0)
+        second = self.get_leaders(snapshot, 1)
+        third = self.get_leaders(snapshot, 2)
         pages = [
             ("1st Place:", 1),
-            (f"{self.get_leaders(0)[0]}", 2),
-            (f"{self.get_leaders(0)[1]} Points", 2),
+            (f"{first[0]}", 2),
+            (f"{first[1]} Points", 2),
             (" ", 0),
             ("2nd Place:", 1),
-            (f"{self.get_leaders(1)[0]}", 2),
-            (f"{self.get_leaders(1)[1]} Points", 2),
+            (f"{second[0]}", 2),
+            (f"{second[1]} Points", 2),
             (" ", 0),
             ("3rd Place:", 1),
-            (f"{self.get_leaders(2)[0]}", 2),
-            (f"{self.get_leaders(2)[1]} Points", 2),
+            (f"{third[0]}", 2),
+            (f"{third[1]} Points", 2),
             (" ", 0),
             (f"Total:", 1),
-            (f"{self.get_stats('totalGlobalBloops')} Boops", 2),
+            (f"{self.get_stats(snapshot, 'totalGlobalBloops')} Boops", 2),
             (" ", 0),
             (f"Last 24 hours:", 1),
-            (f"{self.get_stats('bloopsLastDay')} Boops", 2),
+            (f"{self.get_stats(snapshot, 'bloopsLastDay')} Boops", 2),
             (" ", 0),
             (f"Last hour:", 1),
-            (f"{self.get_stats('bloopsLastHour')} Boops", 2),
+            (f"{self.get_stats(snapshot, 'bloopsLastHour')} Boops", 2),
             (" ", 0),
             (f"Dragon = PQRS", .2),
             (" ", 0),
@@ -117,11 +189,3 @@ class Furvester:
             ]
 
         return pages
-
-    def achievementcode(self):
-        buffer = FrameBuffer(self.display.width, self.display.height)
-        buffer.copy_buffer(self.display, 0, 0)
-        self.display.text(ACHIEVEMENT)
-        self.display.copy_buffer(buffer, 0, 0)
-        self.display.show()
-
@@ -1,28 +1,45 @@
 #!/usr/bin/env python3
 import sys
 print(sys.prefix, sys.base_prefix)
+import asyncio
+import logging
+import os
 import time
 import flipdot
+from flipdot.modes import MessageMode
+from flipdot.scheduler import Scheduler
+from flipdot.sources import Poller
+from furvester import FurvesterMode
 from server import Server
 # from getip import get_ip
 from mqtt import Client
 import signal
 
+# FLIPDOT_LOGLEVEL=DEBUG logs every request
+logging.basicConfig(level=os.environ.get("FLIPDOT_LOGLEVEL", "INFO"), format="%(levelname)s %(name)s: %(message)s")
+
+running = True
+wakeup = None  # asyncio.Event to wake up the display loop before its next scheduled update
+
 
 def stop(_sig=None, _frame=None):
     global running
     running = False
+    if wakeup is not None:
+        wakeup.set()
 
 
-# catch termination signal and quit gracefully
-signal.signal(signal.SIGTERM, stop)
-
-running = True
-
 # initialize display
-display = flipdot.FlipDot()
+display = flipdot.FlipDot(parallel_panels=3)
+display.start()  # flip the dots in the background
+# modes with remote data fetch it on the event loop through the poller
+poller = Poller()
+# the scheduler selects the mode: a playlist, interrupted by messages and alerts
+# e.g. Scheduler(display, [Entry("furvester", 300, "10:00", "02:00"), Entry("dayclock", 60)], default="dayclock")
+scheduler = Scheduler(display)
+display.register_mode("furvester", FurvesterMode(poller, scheduler=scheduler))
 # initialize webserver
-server = Server(display)
+server = Server(display, scheduler=scheduler)
 # start mqtt client
 mqtt = Client()
 
@@ -31,14 +48,42 @@ mqtt = Client()
 # display.clear()
 display.mode = "dayclock"
 
+
+def alert(text: str) -> None:
+    # alerts preempt messages and the playlist
+    scheduler.interrupt("alert", MessageMode(text), priority=2, duration=30)
+    wakeup.set()
+
+
+async def run() -> None:
+    global wakeup
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    # catch termination signal and quit gracefully
+    loop.add_signal_handler(signal.SIGTERM, stop)
+    # requests and mqtt messages can change what the display shows, let them wake up the display loop
+    server.on_change = wakeup.set
+    mqtt.on_change = lambda: loop.call_soon_threadsafe(wakeup.set)
+    mqtt.on_alert = lambda text: loop.call_soon_threadsafe(alert, text)
+    await server.start()
+    await poller.start()
+
+    while running:
+        wakeup.clear()
+        nextupdate = scheduler.loop(standby=mqtt.get_standby())
+        timeout = None if nextupdate is None else max(0.0, nextupdate - time.time())
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    await poller.stop()
+    await server.stop()
+
+
 if __name__ == "__main__":
     try:
-        starttime = time.time()
-        while running:
-            server.accept_http()
-            display.loop(standby=mqtt.get_standby())
-            time.sleep(.01)
-
+        asyncio.run(run())
     except KeyboardInterrupt:
         pass
 
@@ -4,6 +4,8 @@ import paho.mqtt.client as mqtt
 class Client:
     def __init__(self):
         self.display = True
+        self.on_change = None  # called from the mqtt thread when the display state changed
+        self.on_alert = None  # called from the mqtt thread with the text of an alert
 
         # initialize mqtt client
         self.client = mqtt.Client()
@@ -23,6 +25,7 @@ class Client:
     def _mqtt_connect(self, _client, _userdata, _flags, _rc):
         print("MQTT Connected")
         self.client.subscribe("home/living/displays")
+        self.client.subscribe("home/living/displays/alert")
 
     def _mqtt_message(self, _client: mqtt, _userdata, msg: mqtt.MQTTMessage):
         message = msg.payload.decode()
@@ -32,3 +35,8 @@ class Client:
                 self.display = True
             if message.lower() == "off":
                 self.display = False
+            if self.on_change is not None:
+                self.on_change()
+        elif msg.topic == "home/living/displays/alert":
+            if message and self.on_alert is not None:
+                self.on_alert(message)
@@ -1,13 +1,109 @@
-import socket
+import asyncio
+import base64
+import gzip
+import hashlib
 import os
 import json
+import logging
+import secrets
+import time
+import urllib.parse
 import flipdot
-import traceback
 
 import flipdot.flipdot
+from flipdot.framebuf import FrameBuffer
+from flipdot import bitmap
+from flipdot.modes import MessageMode
+from flipdot.scheduler import Entry, Scheduler
 
+log = logging.getLogger("server")
 
-class Server(socket.socket):
+
+class StaticFile:
+    def __init__(self, filename: str, contenttype: str) -> None:
+        """
+        A file of the web interface, read once and kept in memory together with its gzip variant and headers
+        :param filename:
+        Path of the file
+        :param contenttype:
+        Content-Type to send the file with
+        """
+        self.filename = filename
+        self.mtime = os.stat(filename).st_mtime_ns
+        with open(filename, "rb") as f:
+            self.data = f.read()
+        self.etag = '"' + hashlib.blake2b(self.data, digest_size=8).hexdigest() + '"'
+        self.gzip = gzip.compress(self.data, 9, mtime=0)
+        if len(self.gzip) >= len(self.data):  # not worth it, e.g. for already compressed files
+            self.gzip = None
+        headers = (f'Content-Type: {contenttype}\r\n'
+                   f'ETag: {self.etag}\r\n'
+                   f'Cache-Control: no-cache\r\n'  # browsers revalidate with If-None-Match before using the file
+                   f'Vary: Accept-Encoding\r\n')
+        self.response = (f'HTTP/1.1 200 OK\r\n{headers}'
+                         f'Content-Length: {len(self.data)}\r\n\r\n').encode() + self.data
+        self.response_gzip = None
+        if self.gzip is not None:
+            self.response_gzip = (f'HTTP/1.1 200 OK\r\n{headers}Content-Encoding: gzip\r\n'
+                                  f'Content-Length: {len(self.gzip)}\r\n\r\n').encode() + self.gzip
+        # a 304 has no body, it only confirms the ETag
+        self.response_unchanged = (f'HTTP/1.1 304 Not Modified\r\n'
+                                   f'ETag: {self.etag}\r\nCache-Control: no-cache\r\n\r\n').encode()
+
+    def get(self, headers: dict) -> bytes:
+        """
+        Returns the response for a request with <headers>: 304 if the client has the file, compressed if it accepts it
+        """
+        if self.etag in headers.get("if-none-match", ""):
+            return self.response_unchanged
+        if self.response_gzip is not None and "gzip" in headers.get("accept-encoding", ""):
+            return self.response_gzip
+        return self.response
+
+
+class StaticCache:
+    def __init__(self, path: str, contenttypes: dict, interval: float = 1.0) -> None:
+        """
+        All files of a directory, kept in memory and reloaded when they change
+        :param path:
+        Directory of the files
+        :param contenttypes:
+        File extension -> Content-Type, "" is used for unknown extensions
+        :param interval:
+        Seconds between two checks of the directory for changed files
+        """
+        self.path = path
+        self.contenttypes = contenttypes
+        self.interval = interval
+        self.files = {}  # name -> StaticFile
+        self.lastCheck = 0.0
+        self.refresh()
+
+    def refresh(self) -> None:
+        # (re)load all files that are new or have a different modification time and forget deleted files
+        files = {}
+        for entry in os.scandir(self.path):
+            if not entry.is_file():
+                continue
+            cached = self.files.get(entry.name)
+            if cached is None or cached.mtime != entry.stat().st_mtime_ns:
+                ext = entry.name.split(".")[-1]
+                log.info("Load file %s", entry.path)
+                cached = StaticFile(entry.path, self.contenttypes.get(ext, self.contenttypes[""]))
+            files[entry.name] = cached
+        self.files = files
+        self.lastCheck = time.monotonic()
+
+    def get(self, name: str) -> StaticFile | None:
+        """
+        Returns the file <name> or None if there is no such file
+        """
+        if time.monotonic() - self.lastCheck >= self.interval:
+            self.refresh()
+        return self.files.get(name)
+
+
+class Server:
     contentTypes = {
         "": "text/plain",
         "html": "text/html",
@@ -16,144 +112,344 @@ class Server(socket.socket):
         "txt": "text/plain",
         "json": "application/json",
         "ico": "image/x-icon",
+        "bin": "application/octet-stream",
+    }
+    # commands that only report the state without a parameter, their answers can be cached
+    statusEndpoints = ("light", "text", "mode", "fonts", "modes")
+    # Content-Type of an uploaded frame -> format for flipdot.bitmap.load()
+    frameFormats = {
+        "application/octet-stream": "raw",
+        "image/x-portable-bitmap": "pbm",
+        "image/x-portable-anymap": "pbm",
     }
 
-    def __init__(self, displayobj: flipdot.flipdot.FlipDot):
+    def __init__(self, displayobj: flipdot.flipdot.FlipDot, port: int = 8080, host: str = "localhost",
+                 scheduler: Scheduler = None):
         self.display = displayobj  # display driver object
-        self.path = "/home/qetesh/flipdot/www/"  # path to www files in on-device filesystem
-
-        # configure socket
-        super().__init__(socket.AF_INET, socket.SOCK_STREAM)
-        self.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # reuse address and port in case of script restart
-        self.bind(('localhost', 8080))  # http port 80 on localhost
-        self.listen()  # start to listen for connections
-        self.settimeout(0)  # set socket to non-blocking
-        self.conn = None  # used to store current connection handler
-
-    def send_pixels(self):
-        self.send_header(filename="status.txt")
-        for y in range(self.display.height):
-            row = ""
-            for x in range(self.display.width):
-                row += str(self.display.pixel(x, y))
-            if y < self.display.height - 1:
-                row += "\n"
-            self.conn_send(row)
-
-    def send_file(self, filename: str):
-        # send file from filesystem
-        print("Send file", filename)
-        ext = filename.split(".")[-1]
-        readmode = "rb"
-        if ext in self.contentTypes:
-            if self.contentTypes[ext].split("/")[0] == "text":
-                readmode = "r"
-        self.send_header(filename=filename)
-        with open(filename, readmode) as f:
-            file = f.read()
-            if readmode == "r":
-                file = file.encode()
-            self.conn.send(file)
-
-    def send_header(self, filename: str = ""):
+        self.scheduler = scheduler  # shows messages and plays the playlist, None if there is none
+        self.messageTime = 10  # default seconds a message is shown
+        self.path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "www/")  # path to www files
+        self.static = StaticCache(self.path, self.contentTypes)  # files of the web interface
+        self.host = host
+        self.port = port
+        self.server = None  # asyncio server, created by start()
+        self.on_change = None  # called after a request that might have changed the display state
+        self.keepalive = 30  # seconds an idle connection is kept open
+        self.maxbody = 1024 * 1024  # largest accepted request body in bytes
+        self.chunksize = 64 * 1024  # responses are written in chunks of this size
+        self.longpoll = 30  # seconds a request for a new frame is held open
+        # part of the ETags built from version counters, which start at 0 again after a restart
+        self.instance = secrets.token_hex(4)
+        self._frameChanged = None  # asyncio.Event set when the display shows a new frame, replaced afterwards
+        self._listener = None  # listener registered on the display
+        self._pixels = (-1, b"")  # version and text of the last text status
+        self._connections = set()  # tasks serving the open connections
+        self.eventqueue = 16  # frames waiting for an event stream client before it has to start over with a keyframe
+        self.keyframeInterval = 10  # seconds between two full frames on an event stream
+        self.eventping = 15  # seconds without frames after which an event stream gets a comment to keep it open
+        self._eventClients = set()  # queues of all event stream clients
+        self.maxframes = 1000  # most frames an uploaded animation may have
+        self._status = (None, {})  # versions of display state and frame, endpoints -> cached status response
+
+    async def start(self) -> None:
+        # start to listen for connections on the running asyncio event loop
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                 reuse_address=True)  # reuse address and port in case of restart
+        # the display tells about new frames from its driver thread, hand them over to the event loop
+        loop = asyncio.get_running_loop()
+        self._frameChanged = asyncio.Event()
+        # displayed is replaced right before the listeners are called, so it belongs to this version
+        self._listener = lambda version, columns: loop.call_soon_threadsafe(
+            self._frame_changed, version, columns, self.display.displayed[1])
+        self.display.subscribe(self._listener)
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self.display.unsubscribe(self._listener)
+            self._listener = None
+        if self.server is not None:
+            self.server.close()
+            connections = list(self._connections)
+            for task in connections:  # keep-alive connections would keep the server open
+                task.cancel()
+            await asyncio.gather(*connections, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # answer requests on the connection until the client closes it - HTTP/1.1 keeps connections open by default
+        # and pipelined requests simply wait in the reader until the previous response is written
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive)
+                except asyncio.LimitOverrunError:
+                    await self._write(writer, self.send_rcode(431, "Request header too large"))
+                    break
+                except asyncio.TimeoutError:  # idle connection
+                    break
+                request = self.parse_request(head)
+                if request is None:
+                    await self._write(writer, self.send_rcode(400, "Malformed request"))
+                    break
+                method, uri, query, version, headers = request
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await self._write(writer, self.send_rcode(400, "Invalid Content-Length"))
+                    break
+                if length > self.maxbody:
+                    await self._write(writer, self.send_rcode(413, "Request body too large"))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                endpoint = uri[1]
+                if method == "GET" and endpoint == "events":
+                    await self.stream_events(writer)
+                    break  # the stream has no length, it ends with the connection
+                if method == "GET" and endpoint == "pixels" and "since" in query:
+                    await self.wait_frame(query["since"])
+                response = self.respond(method, uri, headers, body, query)
+                await self._write(writer, response or self.send_rcode(400, "Bad request"))
+                if self.on_change is not None:
+                    self.on_change()
+                connection = headers.get("connection", "").lower()
+                if connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive"):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:  # server stopped
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _write(self, writer: asyncio.StreamWriter, response: bytes) -> None:
+        # write the response in chunks and wait for the client to take them, so large responses do not pile up
+        for start in range(0, len(response), self.chunksize):
+            writer.write(response[start:start + self.chunksize])
+            await writer.drain()
+
+    def _frame_changed(self, version: int, columns: list, frame: bytes) -> None:
+        # wake up everybody waiting for a new frame
+        self._frameChanged.set()
+        self._frameChanged = asyncio.Event()
+        for client in self._eventClients:
+            try:
+                client.put_nowait((version, columns, frame))
+            except asyncio.QueueFull:
+                # the client is too slow - drop its frames, it gets the current frame as keyframe instead
+                while not client.empty():
+                    client.get_nowait()
+                client.put_nowait(None)
+
+    async def stream_events(self, writer: asyncio.StreamWriter) -> None:
+        """
+        Send every change of the display as server-sent events until the client disconnects. An event "delta" has
+        the changed columns, an event "keyframe" all of them, both as packed bytes of the framebuffer
+        """
+        client = asyncio.Queue(self.eventqueue)
+        self._eventClients.add(client)
+        try:
+            await self._write(writer, ('HTTP/1.1 200 OK\r\n'
+                                       'Content-Type: text/event-stream\r\n'
+                                       'Cache-Control: no-cache\r\n\r\n').encode())
+            version, frame = self.display.displayed
+            await self._write(writer, self._event_keyframe(version, frame))
+            lastKeyframe = time.monotonic()
+            while True:
+                try:
+                    message = await asyncio.wait_for(client.get(), self.eventping)
+                except asyncio.TimeoutError:
+                    await self._write(writer, b": ping\n\n")
+                    continue
+                if message is None or time.monotonic() - lastKeyframe >= self.keyframeInterval:
+                    version, frame = self.display.displayed
+                    event = self._event_keyframe(version, frame)
+                    lastKeyframe = time.monotonic()
+                elif message[0] > version:  # skip frames older than the last keyframe
+                    version, columns, frame = message
+                    event = self._event_delta(version, columns, frame)
+                else:
+                    continue
+                await self._write(writer, event)
+        finally:
+            self._eventClients.discard(client)
+
+    def _event_keyframe(self, version: int, frame: bytes) -> bytes:
+        data = {"version": version, "width": self.display.width, "height": self.display.height,
+                "data": base64.b64encode(frame).decode()}
+        return f'id: {version}\nevent: keyframe\ndata: {json.dumps(data)}\n\n'.encode()
+
+    def _event_delta(self, version: int, columns: list, frame: bytes) -> bytes:
+        size = len(frame) // self.display.width  # bytes per column
+        packed = b"".join(frame[column * size:(column + 1) * size] for column in columns)
+        data = {"version": version, "columns": columns, "data": base64.b64encode(packed).decode()}
+        return f'id: {version}\nevent: delta\ndata: {json.dumps(data)}\n\n'.encode()
+
+    async def wait_frame(self, since: str) -> None:
+        """
+        Wait until the display shows a newer frame than version <since> or the long-poll time is over
+        """
+        try:
+            since = int(since)
+        except ValueError:
+            return
+        deadline = time.monotonic() + self.longpoll
+        # a version from the future is from before a restart, the client needs the current frame right away
+        while self._frameChanged is not None and self.display.displayed[0] == since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._frameChanged.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    def send_pixels(self, headers: dict, query: dict) -> bytes:
+        # send the dots on the display - as rows of 0 and 1 or with format=raw as the packed columns of the
+        # framebuffer, one byte per column and the LSB being the top row. The frame version is in the ETag
+        version, columns = self.display.displayed
+        etag = f'"{self.instance}-{version}"'
+        extra = (f'ETag: {etag}\r\n'
+                 f'Cache-Control: no-cache\r\n')
+        if etag in headers.get("if-none-match", ""):
+            return self.send_unchanged(extra)
+        extra += f'X-Frame-Version: {version}\r\n'
+        if query.get("format") == "raw":
+            extra += f'X-Width: {self.display.width}\r\nX-Height: {self.display.height}\r\n'
+            return self.send_header("bin", columns, extra=extra)
+        if self._pixels[0] != version:
+            frame = FrameBuffer(self.display.width, self.display.height, bytearray(columns))
+            rows = ["".join(str(frame.get_pixel(x, y)) for x in range(frame.width)) for y in range(frame.height)]
+            self._pixels = (version, "\n".join(rows).encode())
+        return self.send_header("status.txt", self._pixels[1], extra=extra)
+
+    def send_file(self, file: StaticFile, headers: dict) -> bytes:
+        # send file from the cache
+        return file.get(headers)
+
+    def send_header(self, filename: str = "", body: bytes = b"", code: str = "200 OK", extra: str = "") -> bytes:
+        # returns the complete response - the length tells the client where it ends, so the connection can stay open
         ext = filename.split(".")[-1]
         if ext not in self.contentTypes:
             ext = ""
-        self.conn_send('HTTP/1.1 200 OK\n')
-        self.conn_send(f'Content-Type: {self.contentTypes.get(ext)}\n')
-        self.conn_send('Connection: close\n\n')
+        return (f'HTTP/1.1 {code}\r\n'
+                f'Content-Type: {self.contentTypes.get(ext)}\r\n{extra}'
+                f'Content-Length: {len(body)}\r\n\r\n').encode() + body
+
+    @staticmethod
+    def send_unchanged(extra: str) -> bytes:
+        # 304 for a client that has the current version - no body, so neither Content-Type nor Content-Length
+        return f'HTTP/1.1 304 Not Modified\r\n{extra}\r\n'.encode()
 
-    def send_rcode(self, code: int, text: str):
+    def send_rcode(self, code: int, text: str) -> bytes:
         # send HTTP code to client
-        self.conn_send(f'HTTP/1.1 {code}\n')
-        self.conn_send('Content-Type: text/html\n')
-        self.conn_send('Connection: close\n\n')
-        self.conn_send(f'{code}: {text}\n')
+        return self.send_header("html", f'{code}: {text}\n'.encode(), str(code))
+
+    def send_status(self, headers: dict, endpoints: tuple = ("light", "text", "mode")) -> bytes:
+        # send the state of the endpoints - the answers only change with the display state and the frame on the
+        # display, so they are built once per version and clients can ask if their copy is still up to date
+        version = (self.display.stateVersion, self.display.displayed[0])
+        if self._status[0] != version:
+            self._status = (version, {})
+        etag = f'"{self.instance}-{version[0]}-{version[1]}"'
+        extra = f'ETag: {etag}\r\nCache-Control: no-cache\r\n'
+        if etag in headers.get("if-none-match", ""):
+            return self.send_unchanged(extra)
+        responses = self._status[1]
+        if endpoints not in responses:
+            answer = self.jsonparse({endpoint: None for endpoint in endpoints})
+            responses[endpoints] = self.send_header("json", json.dumps(answer).encode(), extra=extra)
+        return responses[endpoints]
 
-    def send_json(self, data: dict):
+    def send_json(self, data: dict) -> bytes:
         # send JSON string to client
-        self.send_header("json")
-        self.conn_send(json.dumps(data))
+        return self.send_header("json", json.dumps(data).encode())
 
-    def conn_send(self, data: str) -> None:
+    @staticmethod
+    def parse_request(head: bytes) -> tuple | None:
+        # parse the request line and headers
+        # returns method, uri, query parameters, HTTP version and headers with lowercase names
         try:
-            self.conn.send(data.encode())
-        except BrokenPipeError:
-            pass
-    
-    def accept_http(self) -> bool:
-        # accept connection and parse incoming data
-        try:
-            self.conn, addr = super().accept()
-        except OSError:
-            return False
-        # print("Connection from ", str(addr))
+            rawheaders = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+            method, path, version = rawheaders.pop(0).split(" ")  # first line contains the method, uri and version
+            headers = {}
+            for header in rawheaders:  # rest of the header block gets parsed into dictionary
+                name, value = header.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        except ValueError as e:
+            log.warning("Exception while parsing the request: %r %r", e, head)
+            return None
+        path, _, query = path.partition("?")
+        if not path.startswith("/"):
+            # e.g. "OPTIONS * HTTP/1.1" or an absolute URI - all endpoints are paths
+            log.warning("Request without a path: %r", head)
+            return None
+        query = dict(urllib.parse.parse_qsl(query))
+        return method, path.split("/"), query, version, headers
+
+    def handle_http(self, raw: bytes) -> bytes | None:
+        # parse a complete request and return the response
 
         # split headers and body
-        raw = None
         try:
-            raw = self.conn.recv(4096).decode()
-            rawheaders, body = raw.split("\r\n\r\n", 1)
+            head, body = raw.split(b"\r\n\r\n", 1)
         except ValueError as e:
-            print("Exception while unpacking the data:", repr(e))
-            print(raw)
-            self.conn.close()
-            return False
-        finally:
-            del raw
-
-        # parse headers
-        rawheaders = rawheaders.split("\r\n")
-        request = rawheaders.pop(0).split(" ")  # first line always contains the method, uri and HTTP version
-        headers = {}
-        for header in rawheaders:  # rest of the header block gets parsed into dictionary
-            header = header.split(":", 1)
-            headers[header[0].strip()] = header[1].strip()
-
-        # get method and uri
-        method = request[0]
-        uri = request[1].split("/")
+            log.warning("Exception while unpacking the data: %r %r", e, raw)
+            return None
+        request = self.parse_request(head)
+        if request is None:
+            return None
+        method, uri, query, version, headers = request
+        return self.respond(method, uri, headers, body, query)
+
+    def respond(self, method: str, uri: list, headers: dict, body: bytes, query: dict = None) -> bytes:
+        # return the response to a request
         # print(f"Parsed Request: {method}, {uri}, {body}")
 
+        if query is None:
+            query = {}
+        if len(uri) < 2 or uri[0] != "":
+            return self.send_rcode(400, "Bad request")  # not a path, parse_request() doesn't return those
         # a lot can go wrong. catch everything so the server doesnt stop working...
         try:
             # handle GET requests
             if method == "GET":
-                # check if uri is an existing file, if so, send it
-                if uri[1] in os.listdir(self.path):
+                # check if uri is an existing file, if so, send it - an empty uri gets the index.html
+                file = self.static.get(uri[1] or "index.html")
+                if file is not None:
                     # print(f"Send {uri}")
-                    self.send_file(self.path + uri[1])
+                    return self.send_file(file, headers)
                 # if uri is /pixels we want to send the pixel array
                 elif uri[1] == "pixels":
                     # print("Send pixel-array")
-                    self.send_pixels()
-                # in case uri is empty, send the index.html
-                elif uri[1] == "":
-                    # print("Send index.html")
-                    self.send_file(self.path + "index.html")
+                    return self.send_pixels(headers, query)
                 # for get requests on /json answer with the state of the endpoint
                 elif uri[1] == "json":
-                    if len(uri) > 2:
-                        answer = self.jsonparse({uri[2]: None})
+                    if len(uri) > 2 and uri[2] and uri[2] not in self.statusEndpoints:
+                        return self.send_json(self.jsonparse({uri[2]: None}))
+                    elif len(uri) > 2 and uri[2]:
+                        return self.send_status(headers, (uri[2],))
                     else:  # send status
-                        answer = self.jsonparse({"light": None, "text": None, "mode": None})
-                    self.send_json(answer)
+                        return self.send_status(headers)
                 elif uri[1] == "wifi":
                     if len(uri) == 4:
                         ssid = uri[2]
                         key = uri[3]
-                        print(f"New WiFi Data received: {ssid}, {key}")
+                        log.info("New WiFi Data received: %s, %s", ssid, key)
                         with open("wifi.txt", "w") as file:
                             file.write(ssid)
                             file.write("\n")
                             file.write(key)
                             file.write("\n")
-                        print("WiFi Data stored. Rebooting...")
-                        self.send_header()
+                        log.info("WiFi Data stored. Rebooting...")
                         # machine.reset()
+                        return self.send_header()
                 # 404 for everything else
                 else:
-                    self.send_rcode(404, f"{'/'.join(uri)} not found")
+                    return self.send_rcode(404, f"{'/'.join(uri)} not found")
 
             # handle POST requests
             elif method == "POST":
@@ -162,29 +458,75 @@ class Server(socket.socket):
                     try:
                         js = json.loads(body)
                     except ValueError:  # body does not contain a valid json string
-                        self.send_rcode(400, "Request does not contain a valid json string.")
+                        return self.send_rcode(400, "Request does not contain a valid json string.")
                     else:
                         # We have valid json. Parsing...
-                        self.send_json(self.jsonparse(js))
+                        return self.send_json(self.jsonparse(js))
+                # a whole frame as packed columns (raw or base64) or PBM image
+                elif uri[1] == "frame":
+                    contenttype = headers.get("content-type", "").split(";")[0].strip()
+                    try:
+                        frame = bitmap.load(body, self.display.width, self.display.height,
+                                            query.get("format", self.frameFormats.get(contenttype)))
+                    except ValueError as e:
+                        return self.send_rcode(400, str(e))
+                    return self.send_json(self.upload_frame(frame))
+                # an animation as json: {"frames": [{"data": frame, "duration": seconds}, ...], "repeat": false}
+                elif uri[1] == "animation":
+                    try:
+                        frames, repeat = self.parse_animation(json.loads(body))
+                    except (ValueError, TypeError, AttributeError, KeyError) as e:
+                        return self.send_rcode(400, f"Invalid animation: {e!r}")
+                    self.display.play_animation(frames, repeat)
+                    return self.send_json({"animation": {"frames": len(frames),
+                                                         "duration": sum(seconds for _, seconds in frames),
+                                                         "repeat": repeat}})
                 else:
                     # send 404 for unknown uri
-                    self.send_rcode(404, f"{'/'.join(uri)} not found")
+                    return self.send_rcode(404, f"{'/'.join(uri)} not found")
             else:
                 # send 501 for unknown method
-                self.send_rcode(501, f"Method {method} not implemented")
-        except Exception as e:
-            # something went wrong, send error code
-            self.send_rcode(500, "Server Error: " + traceback.format_exc())
+                return self.send_rcode(501, f"Method {method} not implemented")
+        except Exception:
+            # something went wrong, the details go to the log and not to the client
+            log.exception("Error while responding to %s %s", method, "/".join(uri))
+            return self.send_rcode(500, "Server Error")
+
+    def upload_frame(self, frame: FrameBuffer) -> dict:
+        # show an uploaded frame as it is - switch to the draw mode, so no other mode draws over it
+        self.display.mode = "draw"
+        self.display.copy_buffer(frame, 0, 0)
+        self.display.commit()
+        return {"frame": "OK", "mode": self.display.mode}
 
-        # close connection and free ram
-        self.conn.close()
-        return True
+    def parse_animation(self, js: dict) -> tuple:
+        # returns the frames as list of (FrameBuffer, seconds) and if the animation repeats
+        # the frames are strings with base64 encoded packed columns or PBM images, plain ones also as text
+        frames = []
+        default = float(js.get("duration", 0.1))  # for frames without a duration
+        if not 0 < len(js["frames"]) <= self.maxframes:
+            raise ValueError(f"expecting 1 to {self.maxframes} frames")
+        for item in js["frames"]:
+            if isinstance(item, str):
+                item = {"data": item}
+            seconds = float(item.get("duration", default))
+            if not 0 <= seconds < float("inf"):
+                raise ValueError("duration must be a finite number of seconds, at least 0")
+            frame = bitmap.load(item["data"].encode(), self.display.width, self.display.height, item.get("format"))
+            frames.append((frame, seconds))
+        repeat = bool(js.get("repeat", False))
+        if repeat and sum(seconds for _, seconds in frames) <= 0:
+            raise ValueError("a repeated animation needs a duration")
+        return frames, repeat
 
     def jsonparse(self, js: dict) -> dict:
+        # apply all commands to the framebuffer first and hand it to the display once at the end
+        # {"commit": false} keeps the changes in the framebuffer for a later request
         answer = {}
+        changed = False  # a command drew into the framebuffer
         for command in js.keys():
             params = js[command]
-            print(f"Received command {command}: {params}")
+            log.debug("Received command %s: %s", command, params)
             if command == "setpixel":  # set pixels at x, y to color
                 if type(params) == list:
                     answer[command] = []
@@ -200,7 +542,7 @@ class Server(socket.socket):
                         color = int(color)
                         # print(f"Set Pixel at {x}, {y} to {color}")
                         self.display.pixel(x, y, color)
-                        self.display.show()
+                        changed = True
                         answer[command].append(pixel)
                 else:
                     answer[command] = "Expecting a list of parameters"
@@ -208,6 +550,7 @@ class Server(socket.socket):
                 if params is not None:
                     self.display.mode = params
                     self.display.lastClock = ""
+                    self.display.animationNext = 0  # play an uploaded animation again
                 answer[command] = self.display.mode
             elif command == "text":
                 if type(params) == dict:
@@ -217,20 +560,67 @@ class Server(socket.socket):
                         self.display.align = params.get("align")
                     if params.get("text") is not None:
                         self.display.lastText = params.get("text")
-                    self.display.text(self.display.lastText)
+                    self.display.text(self.display.lastText, show=False)
+                    changed = True
                 answer[command] = {"text": self.display.lastText,
                                    "align": self.display.align,
                                    "font": self.display.font}
             elif command == "fonts":
                 answer[command] = list(self.display.fonts.keys())
+            elif command == "modes":
+                answer[command] = list(self.display.modes.keys())
+            elif command == "message":  # show a text for some seconds, then continue with the current mode
+                if self.scheduler is None:
+                    answer[command] = "No scheduler"
+                elif params:
+                    if type(params) != dict:
+                        params = {"text": params}
+                    try:
+                        duration = float(params.get("duration", self.messageTime))
+                        priority = int(params.get("priority", 1))
+                        message = MessageMode(str(params.get("text", "")), font=params.get("font"),
+                                              align=params.get("align"))
+                    except (TypeError, ValueError):
+                        answer[command] = "Invalid message"
+                    else:
+                        if message.font is not None and message.font not in self.display.fonts:
+                            answer[command] = "Unknown font"
+                        else:
+                            self.scheduler.interrupt("message", message, priority, duration)
+                            answer[command] = "OK"
+                else:
+                    answer[command] = "Expecting a text"
+            elif command == "playlist":
+                if self.scheduler is None:
+                    answer[command] = "No scheduler"
+                    continue
+                if params is not None:
+                    try:
+                        playlist = [Entry.from_dict(entry) for entry in params]
+                    except (TypeError, ValueError, KeyError, AttributeError):
+                        answer[command] = "Invalid playlist"
+                        continue
+                    unknown = [entry.mode for entry in playlist if entry.mode not in self.display.modes]
+                    if unknown:
+                        answer[command] = f"Unknown mode {unknown[0]}"
+                        continue
+                    self.scheduler.set_playlist(playlist)
+                answer[command] = [entry.as_dict() for entry in self.scheduler.playlist]
             elif command == "clear":
                 self.display.clear()
-                self.display.show()
+                changed = True
                 answer[command] = "OK"
             elif command == "fill":
                 self.display.fill(params)
-                self.display.show()
+                changed = True
+            elif command == "commit":
+                pass  # handled below
             else:
                 answer[command] = "Unknown Command"
-        print("Answer:", answer)
+        commit = js.get("commit", changed)
+        if commit and (changed or self.display.dirty_columns()):
+            self.display.show()  # also commits the changes staged by earlier requests
+        if "commit" in js:
+            answer["commit"] = bool(commit)
+        log.debug("Answer: %s", answer)
         return answer
@@ -0,0 +1,78 @@
+"""
+Animations keep their timing on a fake clock: a fast display shows every item on time, a slow one drops frames and
+merges pixel batches, and ends on the same buffer either way
+"""
+from flipdot.animation import Animation
+from flipdot.framebuf import FrameBuffer
+
+
+class FakeDisplay:
+    def __init__(self, showtime: float) -> None:
+        self.now = 0.0
+        self.showtime = showtime  # seconds one update of the display takes
+        self.shows = []  # (time, dirty columns, pixels) of every update
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+    def show(self, canvas: FrameBuffer) -> None:
+        self.shows.append((self.now, canvas.dirty_columns(), bytes(canvas._buf)))
+        canvas.clear_dirty()
+        self.now += self.showtime
+
+
+def column_frames(count: int) -> list:
+    # frame i has column i set
+    frames = []
+    for i in range(count):
+        frame = FrameBuffer(count, 7)
+        frame.set_pixel(i, 3, 1)
+        frames.append(frame)
+    return frames
+
+
+def play(animation: Animation, display: FakeDisplay, width: int) -> FrameBuffer:
+    canvas = FrameBuffer(width, 7)
+    canvas.clear_dirty()
+    animation.play(canvas, display.show, clock=display.clock, sleep=display.sleep)
+    return canvas
+
+
+def test_fast_display_shows_every_frame_on_time():
+    display = FakeDisplay(0.01)
+    frames = column_frames(10)
+    animation = Animation(frames, fps=10)
+    canvas = play(animation, display, 10)
+    assert (animation.shown, animation.dropped) == (10, 0)
+    assert [round(at, 6) for at, _, _ in display.shows] == [round(i * 0.1, 6) for i in range(10)]
+    assert canvas._buf == frames[-1]._buf
+
+
+def test_slow_display_drops_frames():
+    display = FakeDisplay(0.25)
+    frames = column_frames(20)
+    animation = Animation(frames, fps=10)
+    canvas = play(animation, display, 20)
+    assert animation.dropped > 0
+    assert animation.shown + animation.dropped == 20
+    assert animation.shown == len(display.shows)
+    # the animation still ends about on time and on the last frame
+    assert display.now <= 2.0 + 2 * display.showtime
+    assert display.shows[-1][2] == bytes(frames[-1]._buf)
+    assert canvas._buf == frames[-1]._buf
+
+
+def test_slow_display_merges_pixel_batches():
+    display = FakeDisplay(0.25)
+    batches = [[(i, y, 1) for y in range(7)] for i in range(20)]
+    animation = Animation(batches, fps=10)
+    canvas = play(animation, display, 20)
+    assert animation.dropped > 0
+    # every batch reaches the display, the dropped ones together with a later update
+    columns = [column for _, dirty, _ in display.shows for column in dirty]
+    assert sorted(columns) == list(range(20))
+    assert any(len(dirty) > 1 for _, dirty, _ in display.shows)
+    assert all(canvas.get_pixel(x, y) for x in range(20) for y in range(7))
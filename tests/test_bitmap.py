@@ -0,0 +1,30 @@
+"""
+Uploaded frames: PBM images have to give the same pixels as the packed columns, and headers that don't match the
+data have to be rejected before anything is allocated
+"""
+import pytest
+
+from flipdot import bitmap
+
+
+def test_pbm_formats_match_packed():
+    # 3 x 2: top row 101, bottom row 011
+    packed = bitmap.from_packed(bytes([0b01, 0b10, 0b11]), 3, 2)
+    plain = bitmap.from_pbm(b"P1\n# comment\n3 2\n1 0 1\n0 1 1\n")
+    binary = bitmap.from_pbm(b"P4 3 2\n" + bytes([0b10100000, 0b01100000]))
+    assert plain._buf == packed._buf
+    assert binary._buf == packed._buf
+
+
+@pytest.mark.parametrize("data", [b"P4 30000 30000\n", b"P4 3 2\n\xa0", b"P1 30000 30000\n1 0 1", b"P4 0 7\n",
+                                  b"P1 3\n"])
+def test_pbm_rejects_incomplete_images(data):
+    with pytest.raises(ValueError):
+        bitmap.from_pbm(data)
+
+
+def test_load_cuts_large_images():
+    image = b"P1 4 8\n" + b"1111\n" * 8
+    buffer = bitmap.load(image, 3, 7)
+    assert (buffer.width, buffer.height) == (3, 7)
+    assert all(buffer.get_pixel(x, y) for x in range(3) for y in range(7))
@@ -0,0 +1,81 @@
+"""
+The flip plan has to flip every changed pixel exactly once, in an order that saves pin changes
+"""
+import random
+
+import pytest
+
+import flipdot
+from flipdot.flipplan import FlipPlan, column_code, gray_rank
+from flipdot.simulator import SimulatedGPIO
+
+
+def random_plan(rng: random.Random, parallel_panels: int, pixels: int = 200) -> tuple:
+    plan = FlipPlan(parallel_panels)
+    added = {}
+    while len(added) < pixels:
+        pixel = (rng.randrange(3), rng.randrange(28), rng.randrange(7))
+        if pixel not in added:
+            added[pixel] = rng.randrange(2)
+            plan.add(*pixel, added[pixel])
+    return plan, added
+
+
+@pytest.mark.parametrize("parallel_panels", [1, 2, 3])
+def test_every_pixel_once(parallel_panels):
+    plan, added = random_plan(random.Random(parallel_panels), parallel_panels)
+    plan.compile()
+    flipped = {}
+    for column, row, color, panels in plan:
+        assert 1 <= len(panels) <= parallel_panels
+        for panel in panels:
+            assert (panel, column, row) not in flipped
+            flipped[(panel, column, row)] = color
+    assert flipped == added
+
+
+@pytest.mark.parametrize("color", [0, 1])
+def test_current_color_first(color):
+    plan, _ = random_plan(random.Random(color), 3)
+    colors = [step[2] for step in plan.compile(color=color)]
+    assert colors == sorted(colors, key=lambda c: c != color)
+
+
+def test_gray_code_order():
+    plan, _ = random_plan(random.Random(7), 3, pixels=400)
+    steps = plan.compile(color=1)
+    for color in (1, 0):
+        columns = []
+        for column, row, pixcolor, _ in steps:
+            if pixcolor == color and (not columns or columns[-1] != column):
+                columns.append(column)
+        # every column is visited once, in gray code order of its address bits
+        assert len(columns) == len(set(columns))
+        assert columns == sorted(columns, key=lambda c: gray_rank(column_code(c)))
+        # the rows run up and down in turns
+        for i, column in enumerate(columns):
+            rows = [row for c, row, pixcolor, _ in steps if pixcolor == color and c == column]
+            ranks = [gray_rank(row) for row in rows]
+            assert ranks == sorted(ranks, reverse=i % 2 == 1)
+
+
+def test_gray_rank_neighbours():
+    order = sorted(range(32), key=gray_rank)
+    for first, second in zip(order, order[1:]):
+        assert (first ^ second).bit_count() == 1
+
+
+def test_estimated_writes_match_driver():
+    rng = random.Random(3)
+    gpio = SimulatedGPIO()
+    display = flipdot.FlipDot(parallel_panels=2, backend=gpio)
+    for _ in range(5):
+        for x in range(display.width):
+            for y in range(display.height):
+                display.set_pixel(x, y, rng.random() < 0.5)
+        writes = display.pins.writes
+        display.show(avoid_dead=False)
+        # the plan doesn't count switching the power on and off again
+        assert display.pins.writes - writes == display.lastPlan.writes + 4
+        assert gpio.frame().diff(display) == 0
+    assert gpio.errors == 0
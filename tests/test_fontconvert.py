@@ -0,0 +1,53 @@
+"""
+BDF and PSF fonts have to arrive in the font file with the right glyph columns, placed on the baseline
+"""
+import os
+
+import pytest
+
+from flipdot.fontconvert import read_bdf, read_psf, write_fdf
+from flipdot.fonts import Font, FontFile
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# one byte per column, LSB being the top pixel
+BDF_GLYPHS = {
+    " ": b"\x00",  # empty glyphs keep half of their advance
+    ",": b"\x40\x30",  # below the baseline
+    "A": b"\x3e\x09\x09\x09\x3e",
+}
+PSF_GLYPHS = {
+    "1": b"\x42\x7f\x40",  # trimmed to the pixels
+    "-": b"\x08\x08\x08\x08",
+    "‐": b"\x08\x08\x08\x08",  # second entry of the unicode table, the combining sequence is ignored
+    " ": b"\x00\x00",
+}
+
+
+@pytest.mark.parametrize("filename, read, glyphs, width", [
+    ("tiny.bdf", read_bdf, BDF_GLYPHS, 5),
+    ("tiny.psf", read_psf, PSF_GLYPHS, 4),
+])
+def test_convert(tmp_path, filename, read, glyphs, width):
+    read_glyphs, read_width, height = read(os.path.join(FIXTURES, filename))
+    assert read_glyphs == glyphs
+    assert (read_width, height) == (width, 7)
+    target = str(tmp_path / "tiny.fdf")
+    write_fdf(target, read_glyphs, read_width, height, padding=1)
+    fontfile = FontFile(target)
+    assert (fontfile.width, fontfile.height, fontfile.padding, fontfile.mono) == (width, 7, 1, False)
+    assert {char: fontfile.glyph(char) for char in fontfile.chars()} == glyphs
+    # rendered with one column of padding between the glyphs
+    font = Font(target)
+    text = "".join(glyphs)
+    assert font.render(text) == b"".join(glyph + b"\x00" for glyph in glyphs.values())
+    assert font.textwidth(text) == sum(len(glyph) + 1 for glyph in glyphs.values())
+
+
+def test_reject_other_files(tmp_path):
+    other = tmp_path / "other.psf"
+    other.write_bytes(b"not a font")
+    with pytest.raises(ValueError):
+        read_psf(str(other))
+    with pytest.raises(ValueError):
+        read_bdf(str(other))
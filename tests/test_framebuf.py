@@ -0,0 +1,101 @@
+"""
+The column based FrameBuffer operations have to give the same pixels as the original pixel by pixel versions
+"""
+import random
+
+import pytest
+
+from flipdot.framebuf import FrameBuffer
+
+
+def random_buffer(rng: random.Random, width: int, height: int) -> FrameBuffer:
+    buffer = FrameBuffer(width, height)
+    for x in range(width):
+        for y in range(height):
+            buffer.set_pixel(x, y, rng.random() < 0.5)
+    return buffer
+
+
+def pixels(buffer: FrameBuffer) -> list:
+    return [[buffer.get_pixel(x, y) for x in range(buffer.width)] for y in range(buffer.height)]
+
+
+def copy_per_pixel(target: FrameBuffer, buffer: FrameBuffer, pos_x: int, pos_y: int) -> None:
+    for x in range(buffer.width):
+        for y in range(buffer.height):
+            if pos_x + x in range(target.width) and pos_y + y in range(target.height):
+                target.set_pixel(pos_x + x, pos_y + y, buffer.get_pixel(x, y))
+
+
+def scroll_per_pixel(target: FrameBuffer, offset_x: int, offset_y: int) -> None:
+    if offset_x < 0:
+        shift_x, xend, xmove = 0, target.width + offset_x, 1
+    else:
+        shift_x, xend, xmove = target.width - 1, offset_x - 1, -1
+    if offset_y < 0:
+        y, yend, ymove = 0, target.height + offset_y, 1
+    else:
+        y, yend, ymove = target.height - 1, offset_y - 1, -1
+    while y != yend:
+        x = shift_x
+        while x != xend:
+            target.set_pixel(x, y, target.get_pixel(x - offset_x, y - offset_y))
+            x += xmove
+        y += ymove
+
+
+def diff_per_pixel(first: FrameBuffer, second: FrameBuffer) -> int:
+    return sum(first.get_pixel(x, y) != second.get_pixel(x, y)
+               for x in range(first.width) for y in range(first.height))
+
+
+@pytest.mark.parametrize("height", [7, 8, 12, 16])
+def test_copy_buffer_matches_per_pixel(height):
+    rng = random.Random(height)
+    for _ in range(50):
+        target = random_buffer(rng, 30, height)
+        source = random_buffer(rng, rng.randint(1, 40), rng.randint(1, height + 4))
+        pos_x, pos_y = rng.randint(-45, 35), rng.randint(-height - 4, height + 2)
+        expected = FrameBuffer(target.width, target.height, bytearray(target._buf))
+        copy_per_pixel(expected, source, pos_x, pos_y)
+        target.copy_buffer(source, pos_x, pos_y)
+        assert pixels(target) == pixels(expected), (source.width, source.height, pos_x, pos_y)
+
+
+def test_copy_buffer_same_layout():
+    rng = random.Random(1)
+    source = random_buffer(rng, 84, 7)
+    target = FrameBuffer(84, 7)
+    target.copy_buffer(source, 0, 0)
+    assert target._buf == source._buf
+
+
+@pytest.mark.parametrize("height", [7, 8, 12])
+def test_scroll_matches_per_pixel(height):
+    rng = random.Random(height)
+    for _ in range(50):
+        buffer = random_buffer(rng, 30, height)
+        # the pixel by pixel version only handles offsets that fit into the buffer
+        offset_x, offset_y = rng.randint(-29, 29), rng.randint(-height + 1, height - 1)
+        expected = FrameBuffer(buffer.width, buffer.height, bytearray(buffer._buf))
+        scroll_per_pixel(expected, offset_x, offset_y)
+        buffer.scroll(offset_x, offset_y)
+        assert pixels(buffer) == pixels(expected), (offset_x, offset_y)
+
+
+@pytest.mark.parametrize("height", [7, 8, 12])
+def test_diff_matches_per_pixel(height):
+    rng = random.Random(height)
+    for _ in range(50):
+        first, second = random_buffer(rng, 30, height), random_buffer(rng, 30, height)
+        assert first.diff(second) == diff_per_pixel(first, second)
+    assert first.diff(first) == 0
+
+
+def test_dirty_columns():
+    buffer = FrameBuffer(10, 7)
+    assert buffer.dirty_columns() == list(range(10))
+    buffer.clear_dirty()
+    buffer.set_pixel(3, 2, 1)
+    buffer.copy_buffer(FrameBuffer(2, 7), 6, 0)
+    assert buffer.dirty_columns() == [3, 6, 7]
@@ -0,0 +1,123 @@
+"""
+The PinBank has to write as few lines with as few calls as possible - checked with a backend that records every
+call, and the whole driver against the simulated display
+"""
+import random
+
+import flipdot
+from flipdot.GPIO import PinBank
+from flipdot.flipplan import column_code
+from flipdot.simulator import SimulatedGPIO
+
+
+class RecordingGPIO:
+    OUT = 0
+
+    def __init__(self) -> None:
+        self.calls = []  # (channel, value) as passed to output()
+        self.levels = {}
+
+    def setwarnings(self, warnings: bool) -> None:
+        pass
+
+    def setup(self, channel: int, direction: int, initial: int = 0) -> None:
+        self.levels[channel] = initial
+
+    def output(self, channel, value) -> None:
+        self.calls.append((channel, value))
+        if isinstance(channel, list):
+            self.levels.update(zip(channel, value))
+        else:
+            self.levels[channel] = value
+
+    def cleanup(self) -> None:
+        pass
+
+
+class TimedGPIO(RecordingGPIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.pulses = []
+
+    def pulse(self, channels: list, microseconds: int) -> None:
+        self.pulses.append((channels, microseconds))
+
+
+def column_bank(gpio) -> PinBank:
+    pins = PinBank(gpio)
+    for name, channel in (("A0", 13), ("A1", 12), ("A2", 6), ("B0", 7), ("B1", 8)):
+        pins.add(name, channel)
+    pins.add_group("column", ["A0", "A1", "A2", "B0", "B1"], [column_code(col) for col in range(28)])
+    return pins
+
+
+def test_select_writes_changed_lines_in_one_call():
+    gpio = RecordingGPIO()
+    pins = column_bank(gpio)
+    for previous in range(28):
+        for column in range(28):
+            pins.select("column", previous)
+            gpio.calls = []
+            pins.select("column", column)
+            changed = column_code(previous) ^ column_code(column)
+            if changed == 0:
+                assert gpio.calls == []
+            elif changed.bit_count() == 1:
+                assert len(gpio.calls) == 1 and not isinstance(gpio.calls[0][0], list)
+            else:
+                # one list call with exactly the lines that change
+                assert len(gpio.calls) == 1
+                channels, values = gpio.calls[0]
+                assert len(channels) == changed.bit_count()
+            code = column_code(column)
+            assert [gpio.levels[channel] for channel in (13, 12, 6, 7, 8)] == [code >> bit & 1 for bit in range(5)]
+
+
+def test_statistics():
+    gpio = RecordingGPIO()
+    pins = column_bank(gpio)
+    pins.select("column", 0)  # 00001
+    pins.select("column", 7)  # 01001
+    pins.output({"A0": 1, "B0": 1})  # nothing changes
+    assert (pins.writes, pins.calls) == (2, 2)
+
+
+def test_pulse_untimed():
+    gpio = RecordingGPIO()
+    pins = PinBank(gpio)
+    pins.add("EN0", 10)
+    pins.add("EN1", 9)
+    pins.pulse(["EN0", "EN1"], 1)
+    assert not pins.timed
+    assert gpio.calls == [([10, 9], [1, 1]), ([10, 9], [0, 0])]
+
+
+def test_pulse_timed_by_backend():
+    gpio = TimedGPIO()
+    pins = PinBank(gpio)
+    pins.add("EN0", 10)
+    pins.add("EN2", 25)
+    pins.pulse(["EN0", "EN2"], 250)
+    assert pins.timed
+    assert gpio.pulses == [([10, 25], 250)]
+    assert gpio.calls == []  # the lines are never left high by Python
+
+
+def test_driver_on_simulated_display():
+    rng = random.Random(5)
+    gpio = SimulatedGPIO()
+    display = flipdot.FlipDot(parallel_panels=3, backend=gpio)
+    assert gpio.frame().diff(display) == 0
+    for _ in range(5):
+        for x in range(display.width):
+            for y in range(display.height):
+                display.set_pixel(x, y, rng.random() < 0.3)
+        display.show(avoid_dead=False)
+        assert gpio.frame().diff(display) == 0
+    display.text("Hello")
+    assert gpio.frame().diff(display) == 0
+    # a keyframe drives every dot again
+    flips = gpio.flips
+    display.show(keyframe=True)
+    assert gpio.flips - flips == display.width * display.height
+    assert gpio.errors == 0
@@ -0,0 +1,67 @@
+"""
+The page pipeline renders in the background while the display loop measures texts with the same fonts, and has to
+survive pages that fail to render
+"""
+import threading
+import time
+
+import flipdot
+from flipdot.pages import PagePipeline
+from flipdot.simulator import SimulatedGPIO
+
+
+def wait_for(condition, timeout: float = 5) -> bool:
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.001)
+    return condition()
+
+
+def test_font_cache_shared_by_threads():
+    display = flipdot.FlipDot(backend=SimulatedGPIO())
+    font = display.fonts[display.font]
+    font.cachesize = 4  # evict all the time
+    errors = []
+
+    def measure(offset):
+        try:
+            for i in range(3000):
+                text = f"Page {(i + offset) % 9}"
+                assert font.widths(text)[-1] == font.textwidth(text)
+                font.fit(text * 3, 40)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=measure, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_pipeline_survives_errors():
+    display = flipdot.FlipDot(backend=SimulatedGPIO())
+    pages = [("One", 1), ("Two", 1)]
+    broken = [True]
+
+    def source():
+        if broken[0] and threading.current_thread().name == "page-pipeline":
+            raise RuntimeError("no data")
+        return pages
+
+    pipeline = PagePipeline(display, source)
+    pipeline.start()
+    try:
+        assert wait_for(lambda: pipeline.errors > 0)
+        # the page is rendered in the display loop instead
+        assert pipeline.show_next() == 1
+        assert display.lastText == "One"
+        broken[0] = False
+        pipeline.invalidate()
+        assert wait_for(lambda: pipeline.rendered > 0)
+        pipeline.show_next()
+        assert display.lastText == "Two"
+    finally:
+        pipeline.stop()
+    assert pipeline._thread is None
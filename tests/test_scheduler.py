@@ -0,0 +1,112 @@
+"""
+Interrupts preempt the playlist by priority and expire on a fake clock, the playlist resumes where it stopped
+"""
+import time
+
+import pytest
+
+import flipdot
+from flipdot.modes import MessageMode, Mode
+from flipdot.scheduler import Entry, Scheduler
+from flipdot.simulator import SimulatedGPIO
+
+
+class TextMode(Mode):
+    # shows its text once when started
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.starts = 0
+
+    def start(self, display) -> None:
+        self.starts += 1
+        display.text(self.text)
+
+
+class FakeTime:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeTime:
+    fake = FakeTime()
+    monkeypatch.setattr(time, "time", fake)
+    return fake
+
+
+def scheduled(playlist: list) -> Scheduler:
+    display = flipdot.FlipDot(backend=SimulatedGPIO())
+    display.register_mode("a", TextMode("A"))
+    display.register_mode("b", TextMode("B"))
+    scheduler = Scheduler(display, playlist)
+    scheduler.loop()
+    return scheduler
+
+
+def test_interrupt_preempts_and_restores(clock):
+    scheduler = scheduled([Entry("a", 60), Entry("b", 60)])
+    display = scheduler.display
+    assert display.mode == "a"
+    shown = bytes(display._buf)
+    clock.now += 20
+    message = MessageMode("Hi", transition=False)
+    scheduler.interrupt("message", message, duration=10)
+    assert scheduler.loop() == clock.now + 10
+    assert display.mode == "message" and display.modes["message"] is message
+    assert display.lastText == "Hi"
+    # the interrupt expires, the entry continues with the 40 seconds it had left
+    clock.now += 10
+    assert scheduler.loop() == clock.now + 40
+    assert display.mode == "a" and "message" not in display.modes
+    assert bytes(display._buf) == shown and display.lastText == "A"
+    assert display.modes["a"].starts == 2
+    clock.now += 40
+    scheduler.loop()
+    assert display.mode == "b"
+
+
+def test_lower_priority_waits_for_higher(clock):
+    scheduler = scheduled([Entry("a")])
+    display = scheduler.display
+    scheduler.interrupt("alert", MessageMode("Alert", transition=False), priority=2, duration=10)
+    scheduler.loop()
+    scheduler.interrupt("message", MessageMode("Hi", transition=False), priority=1, duration=20)
+    scheduler.loop()
+    assert display.mode == "alert"
+    # the lower one shows for the rest of its time once the higher one expired
+    clock.now += 10
+    assert scheduler.loop() == clock.now + 10
+    assert display.mode == "message" and "alert" not in display.modes
+    clock.now += 10
+    scheduler.loop()
+    assert display.mode == "a" and scheduler.interrupts == []
+
+
+def test_higher_priority_preempts_lower(clock):
+    scheduler = scheduled([Entry("a")])
+    display = scheduler.display
+    scheduler.interrupt("message", MessageMode("Hi", transition=False), priority=1, duration=20)
+    scheduler.loop()
+    clock.now += 1
+    scheduler.interrupt("alert", MessageMode("Alert", transition=False), priority=2, duration=5)
+    scheduler.loop()
+    assert display.mode == "alert"
+    clock.now += 5
+    scheduler.loop()
+    assert display.mode == "message"
+    clock.now += 14
+    scheduler.loop()
+    assert display.mode == "a" and scheduler._resume is None
+
+
+def test_request_during_interrupt_ends_interrupts(clock):
+    scheduler = scheduled([Entry("a")])
+    display = scheduler.display
+    scheduler.interrupt("message", MessageMode("Hi", transition=False), duration=20)
+    scheduler.loop()
+    display.mode = "b"  # selected by a request
+    scheduler.loop()
+    assert display.mode == "b" and scheduler.interrupts == [] and "message" not in display.modes
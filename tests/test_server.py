@@ -0,0 +1,155 @@
+"""
+The server on a real socket, with the display on the simulated backend
+"""
+import asyncio
+
+import flipdot
+from flipdot.simulator import SimulatedGPIO
+from server import Server
+
+
+async def serve(display: flipdot.FlipDot = None) -> Server:
+    server = Server(display or flipdot.FlipDot(backend=SimulatedGPIO()), port=0)
+    await server.start()
+    return server
+
+
+async def connect(server: Server) -> tuple:
+    return await asyncio.open_connection("localhost", server.server.sockets[0].getsockname()[1])
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple:
+    # returns status, headers and body of one response
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    headers = {}
+    for line in head[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return int(head[0].split(" ")[1]), headers, body
+
+
+async def request(server: Server, raw: bytes) -> tuple:
+    reader, writer = await connect(server)
+    writer.write(raw)
+    response = await asyncio.wait_for(read_response(reader), 5)
+    writer.close()
+    return response
+
+
+def test_requests_without_path():
+    async def run():
+        server = await serve()
+        try:
+            for target in (b"*", b"http://example.com/pixels", b"pixels"):
+                status, _, _ = await request(server, b"GET " + target + b" HTTP/1.1\r\n\r\n")
+                assert status == 400
+            assert server.respond("GET", ["*"], {}, b"").startswith(b"HTTP/1.1 400")
+            # the connection stays usable for good requests
+            status, _, body = await request(server, b"GET /pixels HTTP/1.1\r\n\r\n")
+            assert status == 200 and len(body.split(b"\n")) == server.display.height
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_errors_without_details():
+    async def run():
+        server = await serve()
+
+        def broken(headers, query):
+            raise RuntimeError("secret detail")
+
+        server.send_pixels = broken
+        try:
+            status, _, body = await request(server, b"GET /pixels HTTP/1.1\r\n\r\n")
+            assert status == 500
+            assert b"secret" not in body and b"Traceback" not in body
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_not_modified_without_body_headers():
+    async def run():
+        server = await serve()
+        try:
+            for path in (b"/", b"/pixels", b"/json/text"):
+                status, headers, _ = await request(server, b"GET " + path + b" HTTP/1.1\r\n\r\n")
+                assert status == 200
+                etag = headers["etag"].encode()
+                status, headers, body = await request(
+                    server, b"GET " + path + b" HTTP/1.1\r\nIf-None-Match: " + etag + b"\r\n\r\n")
+                assert status == 304 and body == b""
+                assert set(headers) == {"etag", "cache-control"}
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+async def read_event(reader: asyncio.StreamReader) -> dict:
+    # returns the fields of the next server-sent event
+    fields = {}
+    for line in (await reader.readuntil(b"\n\n")).decode().splitlines():
+        name, _, value = line.partition(": ")
+        fields[name] = value
+    return fields
+
+
+def test_event_stream_sends_one_event_per_commit():
+    async def run():
+        server = await serve()
+        display = server.display
+        try:
+            reader, writer = await connect(server)
+            writer.write(b"GET /events HTTP/1.1\r\n\r\n")
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            assert b"text/event-stream" in head
+            keyframe = await asyncio.wait_for(read_event(reader), 5)
+            version = display.displayed[0]
+            assert keyframe["event"] == "keyframe" and keyframe["id"] == str(version)
+            display.text("Hello")  # commits the frame
+            delta = await asyncio.wait_for(read_event(reader), 5)
+            assert delta["event"] == "delta" and delta["id"] == str(version + 1)
+            # nothing else follows
+            try:
+                extra = await asyncio.wait_for(read_event(reader), 0.2)
+            except asyncio.TimeoutError:
+                extra = None
+            assert extra is None
+            writer.close()
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_long_poll_waits_for_the_next_frame():
+    async def run():
+        server = await serve()
+        display = server.display
+        try:
+            version = display.displayed[0]
+            reader, writer = await connect(server)
+            writer.write(f"GET /pixels?since={version} HTTP/1.1\r\n\r\n".encode())
+            response = asyncio.ensure_future(read_response(reader))
+            await asyncio.sleep(0.05)
+            assert not response.done()  # held open until the frame changes
+            display.text("Hello")
+            status, headers, _ = await asyncio.wait_for(response, 5)
+            assert status == 200 and headers["x-frame-version"] == str(version + 1)
+            # nothing else follows
+            try:
+                extra = await asyncio.wait_for(reader.read(1), 0.2)
+            except asyncio.TimeoutError:
+                extra = None
+            assert extra is None
+            writer.close()
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,40 @@
+"""
+The poller fetches every added source at its interval, until the source is removed again
+"""
+import asyncio
+
+from flipdot.sources import Poller, Source
+
+
+class CountingSource(Source):
+    def __init__(self, **settings) -> None:
+        super().__init__(**settings)
+        self.fetches = 0
+
+    async def fetch(self, client):
+        self.fetches += 1
+        return self.fetches
+
+
+def test_remove_stops_fetching():
+    async def run():
+        poller = Poller()
+        source = CountingSource(interval=0.01)
+        poller.add(source)
+        await poller.start()
+        await asyncio.sleep(0.05)
+        poller.remove(source)
+        await asyncio.sleep(0)  # let the task see the cancellation
+        fetches = source.fetches
+        await asyncio.sleep(0.05)
+        assert fetches > 1
+        assert source.fetches == fetches
+        assert source.current() == fetches  # the data stays
+        # added again, it continues its interval
+        source.interval = 10
+        poller.add(source)
+        await asyncio.sleep(0.02)
+        assert source.fetches == fetches
+        await poller.stop()
+
+    asyncio.run(run())
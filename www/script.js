@@ -5,6 +5,9 @@ let lastchange = 0;
 let pixelChanges = [];
 let textboxtext = "";
 let sendTimeout = -1;
+let events = null;
+let frameVersion = -1;
+let resync = false;
 
 const canvas = document.createElement('canvas');
 const context = canvas.getContext('2d');
@@ -94,12 +97,55 @@ const postData = async (data = {}) => {
 };
 
 const updateCanvas = async () => {
+    if (events !== null && events.readyState === EventSource.OPEN) return; // the event stream keeps us up to date
     if (lastchange + 1 < Math.floor(Date.now() / 1000)) {
         await updatePixels();
         await drawPixels(context);
     }
 };
 
+const applyFrame = async (event, keyframe) => {
+    const message = JSON.parse(event.data);
+    if (!keyframe && message.version <= frameVersion) return;
+    if (lastchange + 1 >= Math.floor(Date.now() / 1000)) {
+        // don't overwrite pixels the user is drawing right now, catch up afterwards
+        resync = true;
+        return;
+    }
+    frameVersion = message.version;
+    if (resync && !keyframe) {
+        resync = false;
+        await updatePixels();
+        await drawPixels();
+        return;
+    }
+    resync = false;
+    const bytes = Uint8Array.from(atob(message.data), c => c.charCodeAt(0));
+    const columns = keyframe ? [...Array(message.width).keys()] : message.columns;
+    const size = bytes.length / columns.length; // bytes per column, the LSB is the top pixel
+    for (let i = 0; i < columns.length; i++) {
+        for (let y = 0; y < pixelarray.length; y++) {
+            const mode = (bytes[i * size + (y >> 3)] >> (y & 7)) & 1 ? '1' : '0';
+            if (pixelarray[y][columns[i]] !== mode) {
+                pixelarray[y][columns[i]] = mode;
+                void drawPixel(columns[i], y, mode, false);
+            }
+        }
+    }
+};
+
+const startEvents = () => {
+    if (!window.EventSource) {
+        setInterval(updateCanvas, 1000);
+        return;
+    }
+    events = new EventSource('/events');
+    events.addEventListener('keyframe', event => applyFrame(event, true));
+    events.addEventListener('delta', event => applyFrame(event, false));
+    // the browser reconnects by itself, poll in between
+    events.addEventListener('error', () => void updateCanvas());
+};
+
 const createCanvas = async () => {
     const display = document.getElementById('display');
     canvas.id = "displaycanvas";
@@ -336,7 +382,7 @@ document.addEventListener('DOMContentLoaded', async () => {
     await createCanvas();
     await addCanvasListeners();
     await createControls();
-    setInterval(updateCanvas, 1000);
+    startEvents();
 
     window.addEventListener('resize', async () => {
         console.log("Redraw");